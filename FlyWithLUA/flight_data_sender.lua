@@ -1,15 +1,39 @@
--- FlyWithLua script pro ukládání letové fáze do TXT souboru
+-- FlyWithLua script pro posílání letové fáze přes UDP a do TXT souboru (záloha)
 
 local FILE_PATH = "Resources/plugins/FlyWithLua/Scripts/flight_data.txt"
 local last_update = os.clock() -- Čas posledního zápisu
 
+-- 📶 UDP přenos (LuaSocket); soubor se zapisuje vždy, aby Python mohl přejít na záložní čtení
+local UDP_ENABLED = true
+local UDP_HOST = "127.0.0.1"
+local UDP_PORT = 49555       -- telemetry_udp_port v config.json
+local UDP_INTERVAL = 0.1     -- s, 10 vzorků za sekundu
+local FILE_INTERVAL = 1      -- s
+
+local udp = nil
+local udp_seq = 0
+local last_udp_send = os.clock()
+
+if UDP_ENABLED then
+    local ok, socket = pcall(require, "socket")
+    if ok and socket then
+        udp = socket.udp()
+        udp:settimeout(0)
+        udp:setpeername(UDP_HOST, UDP_PORT)
+    else
+        logMsg("flight_data_sender: LuaSocket not available, writing flight_data.txt only")
+    end
+end
+
 function save_flight_data()
+    local now = os.clock()
+    local send_udp = udp ~= nil and now - last_udp_send >= UDP_INTERVAL
     -- ✅ Zabráníme příliš častému zápisu
-    if os.clock() - last_update < 1 then
+    local write_file = now - last_update >= FILE_INTERVAL
+    if not send_udp and not write_file then
         return
     end
-    last_update = os.clock()
-    
+
     local groundspeed = get("sim/flightmodel/position/groundspeed") * 1.94384  -- m/s na knots
     local vertical_speed = get("sim/flightmodel/position/vh_ind_fpm")  -- ft/min
     local altitude = get("sim/flightmodel/position/elevation") * 3.28084  -- m na ft
@@ -68,16 +92,29 @@ function save_flight_data()
 
 
 
-    -- 📝 Uložit do TXT souboru
-    local file = io.open(FILE_PATH, "w")
-    if file then
-        file:write(string.format(
-            "phase=%s\naltitude=%.2f\nspeed=%.2f\nvertical_speed=%.2f\nbeacon=%d\nstrobe=%d\ntaxi_light=%d\nlanding_light=%d\ntemperature=%.2f\n",
-            phase, altitude, groundspeed, vertical_speed, beacon, strobe, taxi_light, landing_light, temperature
+    -- 📶 Odeslat vzorek jako jeden datagram: AA1;seq;phase;altitude;speed;vertical_speed;beacon;strobe;taxi_light;landing_light;temperature
+    if send_udp then
+        last_udp_send = now
+        udp_seq = udp_seq + 1
+        udp:send(string.format(
+            "AA1;%d;%s;%.2f;%.2f;%.2f;%d;%d;%d;%d;%.2f",
+            udp_seq, phase, altitude, groundspeed, vertical_speed, beacon, strobe, taxi_light, landing_light, temperature
         ))
-        file:close()
+    end
+
+    -- 📝 Uložit do TXT souboru
+    if write_file then
+        last_update = now
+        local file = io.open(FILE_PATH, "w")
+        if file then
+            file:write(string.format(
+                "phase=%s\naltitude=%.2f\nspeed=%.2f\nvertical_speed=%.2f\nbeacon=%d\nstrobe=%d\ntaxi_light=%d\nlanding_light=%d\ntemperature=%.2f\n",
+                phase, altitude, groundspeed, vertical_speed, beacon, strobe, taxi_light, landing_light, temperature
+            ))
+            file:close()
+        end
     end
 end
 
--- ⏳ **Spouští se každou sekundu**
+-- ⏳ **Spouští se každý snímek, odesílá se podle UDP_INTERVAL / FILE_INTERVAL**
 do_every_frame("save_flight_data()")
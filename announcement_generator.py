@@ -1,18 +1,29 @@
 import openai
-import pygame
 import random
 import time
 import os
 import numpy as np
 from pydub import AudioSegment
-from scipy.signal import lfilter, butter
-from scipy.io.wavfile import read, write
+import io
 import json
-import pyttsx3
 import re
 import sys
-import tempfile
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from announcement_templates import AnnouncementTemplates
+from audio_cache import AudioCache
+from translation_cache import TranslationCache
+import audio_effects
+import chime_cache
+import events
+import metrics
+import offline_tts
+import openai_client
+import playback
+import safety_video_index
+import scratch
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -23,6 +34,13 @@ SCRIPT_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) el
 SAFETY_VIDEO_DIR = os.path.join(SCRIPT_DIR, "safety_videos")
 CONFIG_FILE = "config.json"
 TEMP_DIR = os.path.join(SCRIPT_DIR, "temp")  # Nová složka pro dočasné soubory
+CACHE_DIR = os.path.join(SCRIPT_DIR, "cache")  # Trvalá cache vygenerovaného audia
+TTS_MODEL = "tts-1"
+TTS_PCM_RATE = 24000  # response_format="pcm" vrací 16bit mono 24 kHz
+TTS_STREAM_CHUNK_BYTES = 4800  # 100 ms
+TRANSLATION_MODEL = "gpt-4"
+OFFLINE_TTS_MODEL = "pyttsx3"
+LOCAL_TIME_ROUND_MINUTES = 5  # Místní čas v hlášení po 5 minutách
 
 # Ensure safety video directory exists
 if not os.path.exists(SAFETY_VIDEO_DIR):
@@ -43,78 +61,30 @@ MULTILINGUAL_ANNOUNCEMENTS = {"Gate", "TaxiAfterLanding", "Safety", "Descent", "
 # Define all possible announcement phases
 ANNOUNCEMENTS = ["Gate", "Pushback", "Takeoff", "Descent", "Final", "TaxiAfterLanding", "Deboarding", "AirportBoarding", "LastCall", "InflightService"]
 
-# Load announcements from announcements.txt
-def load_announcements():
-    """Load announcements from announcements.txt file."""
-    announcements = {}
-    announcements_file = os.path.join(SCRIPT_DIR, "announcements.txt")
-    
-    if not os.path.exists(announcements_file):
-        logger.error(f"Announcements file '{announcements_file}' not found! Using default announcements.")
-        return {
-            "Gate": "Ladies and gentlemen, this is your captain speaking. My name is {captain_name} and together with my first officer {first_officer}, we welcome you onboard flight {flight_number} from {origin} to {destination} aboard our {aircraft}. Our flight duration will be approximately {flight_duration}. We will be departing from gate {gate}. {food_and_beverage_info} Thank you for choosing {airline} for your journey today.",
-            "Pushback": "Cabin crew, arm doors and crosscheck.",
-            "Takeoff": "Cabin crew, seats for takeoff.",
-            "Descent": "Ladies and gentlemen, we have started our descent to our destination. Please ensure your seatbelt is fastened, window blinds are open, seat is fully upright, and tray table is stowed. In preparation for landing, the toilets will be locked in about 5 minutes. Cabin crew, prepare the cabin for landing.",
-            "Final": "Cabin crew, seats for landing.",
-            "TaxiAfterLanding": "Ladies and gentlemen, welcome to {destination}. The local time is {local_time} and the outside temperature is {temperature} °C. Thank you for choosing {airline} for your flight, and we wish you a pleasant holiday, a safe journey home, or a smooth continuation of your travels. On behalf of {airline}, we wish you a wonderful day.",
-            "Deboarding": "Cabin crew, disarm doors and crosscheck.",
-            "AirportBoarding": "Ladies and gentlemen, your flight {flight_number} to {destination} is now ready for boarding at gate {gate}. Please have your boarding card ready for scanning and your travel document open on the picture page. {food_and_beverage_info} On behalf of {airline}, we wish you a pleasant flight.",
-            "LastCall": "Ladies and gentlemen, this is the last call for boarding flight {flight_number} to {destination} at gate {gate}. All remaining passengers are requested to proceed immediately to the gate. Thank you.",
-            "InflightService": "Ladies and gentlemen, we are now starting our inflight service. Today, we are offering the following food options: {food_options}. {beverage_service_info} Please have your payment ready if applicable, and thank you for your attention."
-        }
-
-    try:
-        with open(announcements_file, "r", encoding="utf-8") as f:
-            lines = f.read().strip().split("\n\n")  # Oddělíme jednotlivá hlášení podle prázdných řádků
-            for announcement_block in lines:
-                if not announcement_block.strip():
-                    continue
-                block_lines = announcement_block.strip().split("\n")
-                if not block_lines:
-                    continue
-                # První řádek je klíč v hranatých závorkách, např. [Gate]
-                key_line = block_lines[0].strip()
-                if not (key_line.startswith("[") and key_line.endswith("]")):
-                    logger.warning(f"Invalid announcement key format: {key_line}. Skipping.")
-                    continue
-                key = key_line[1:-1]  # Odstraníme závorky, např. [Gate] -> Gate
-                # Zbytek je text hlášení
-                text = " ".join(line.strip() for line in block_lines[1:])  # Spojíme řádky do jednoho textu
-                announcements[key] = text
-        logger.info(f"Successfully loaded announcements from {announcements_file}")
-        return announcements
-    except Exception as e:
-        logger.error(f"Failed to load announcements from {announcements_file}: {e}. Using default announcements.")
-        return {
-            "Gate": "Ladies and gentlemen, this is your captain speaking. My name is {captain_name} and together with my first officer {first_officer}, we welcome you onboard flight {flight_number} from {origin} to {destination} aboard our {aircraft}. Our flight duration will be approximately {flight_duration}. We will be departing from gate {gate}. {food_and_beverage_info} Thank you for choosing {airline} for your journey today.",
-            "Pushback": "Cabin crew, arm doors and crosscheck.",
-            "Takeoff": "Cabin crew, seats for takeoff.",
-            "Descent": "Ladies and gentlemen, we have started our descent to our destination. Please ensure your seatbelt is fastened, window blinds are open, seat is fully upright, and tray table is stowed. In preparation for landing, the toilets will be locked in about 5 minutes. Cabin crew, prepare the cabin for landing.",
-            "Final": "Cabin crew, seats for landing.",
-            "TaxiAfterLanding": "Ladies and gentlemen, welcome to {destination}. The local time is {local_time} and the outside temperature is {temperature} °C. Thank you for choosing {airline} for your flight, and we wish you a pleasant holiday, a safe journey home, or a smooth continuation of your travels. On behalf of {airline}, we wish you a wonderful day.",
-            "Deboarding": "Cabin crew, disarm doors and crosscheck.",
-            "AirportBoarding": "Ladies and gentlemen, your flight {flight_number} to {destination} is now ready for boarding at gate {gate}. Please have your boarding card ready for scanning and your travel document open on the picture page. {food_and_beverage_info} On behalf of {airline}, we wish you a pleasant flight.",
-            "LastCall": "Ladies and gentlemen, this is the last call for boarding flight {flight_number} to {destination} at gate {gate}. All remaining passengers are requested to proceed immediately to the gate. Thank you.",
-            "InflightService": "Ladies and gentlemen, we are now starting our inflight service. Today, we are offering the following food options: {food_options}. {beverage_service_info} Please have your payment ready if applicable, and thank you for your attention."
-        }
-
-# Načtení hlášení z announcements.txt
-announcements = load_announcements()
-
-# Set up ffmpeg for pydub
-FFMPEG_DIR = os.path.join(SCRIPT_DIR, "ffmpeg", "bin")
-ffmpeg_path = os.path.join(FFMPEG_DIR, "ffmpeg.exe")
-ffprobe_path = os.path.join(FFMPEG_DIR, "ffprobe.exe")
-AudioSegment.converter = ffmpeg_path
-AudioSegment.ffprobe = ffprobe_path
-os.environ["PATH"] += os.pathsep + FFMPEG_DIR
+# Výchozí hlášení, pokud announcements.txt chybí
+DEFAULT_ANNOUNCEMENTS = {
+    "Gate": "Ladies and gentlemen, this is your captain speaking. My name is {captain_name} and together with my first officer {first_officer}, we welcome you onboard flight {flight_number} from {origin} to {destination} aboard our {aircraft}. Our flight duration will be approximately {duration}. We will be departing from gate {gate}. {food_and_beverage_info} Thank you for choosing {airline} for your journey today.",
+    "Pushback": "Cabin crew, arm doors and crosscheck.",
+    "Takeoff": "Cabin crew, seats for takeoff.",
+    "Descent": "Ladies and gentlemen, we have started our descent to our destination. Please ensure your seatbelt is fastened, window blinds are open, seat is fully upright, and tray table is stowed. In preparation for landing, the toilets will be locked in about 5 minutes. Cabin crew, prepare the cabin for landing.",
+    "Final": "Cabin crew, seats for landing.",
+    "TaxiAfterLanding": "Ladies and gentlemen, welcome to {destination}. The local time is {local_time} and the outside temperature is {temperature} °C. Thank you for choosing {airline} for your flight, and we wish you a pleasant holiday, a safe journey home, or a smooth continuation of your travels. On behalf of {airline}, we wish you a wonderful day.",
+    "Deboarding": "Cabin crew, disarm doors and crosscheck.",
+    "AirportBoarding": "Ladies and gentlemen, your flight {flight_number} to {destination} is now ready for boarding at gate {gate}. Please have your boarding card ready for scanning and your travel document open on the picture page. {food_and_beverage_info} On behalf of {airline}, we wish you a pleasant flight.",
+    "LastCall": "Ladies and gentlemen, this is the last call for boarding flight {flight_number} to {destination} at gate {gate}. All remaining passengers are requested to proceed immediately to the gate. Thank you.",
+    "InflightService": "Ladies and gentlemen, we are now starting our inflight service. Today, we are offering the following food options: {food_options}. {beverage_service_info} Please have your payment ready if applicable, and thank you for your attention."
+}
+
+# Hlášení z announcements.txt, zkompilovaná do šablon a znovu načtená při změně souboru
+announcement_templates = AnnouncementTemplates(os.path.join(SCRIPT_DIR, "announcements.txt"), DEFAULT_ANNOUNCEMENTS)
 
 # Voice settings
 captain_voices = ["onyx", "ash"]
 voice_captain = random.choice(captain_voices)
 crew_voices = ["coral", "nova", "sage", "shimmer"]
 voice_crew = random.choice(crew_voices)
+# Letištní hlášení mají vlastní hlas, zvolený jednou za běh (aby šla předem vyrenderovat)
+airport_voices = {"AirportBoarding": random.choice(crew_voices), "LastCall": random.choice(crew_voices)}
 
 # Captain styles
 captain_styles = ["professional", "austere", "friendly", "experienced"]
@@ -159,6 +129,48 @@ def load_config():
 config = load_config()
 openai.api_key = config.get("openai_api_key", "")
 
+# Cache for rendered TTS audio (text + voice + speed + model -> PA-processed mp3)
+cache_dir = config.get("cache_dir") or CACHE_DIR
+audio_cache = AudioCache(os.path.join(cache_dir, "audio"), max_bytes=int(config.get("audio_cache_max_mb", 200)) * 1024 * 1024)
+
+# Translation memory (source text + language + captain style -> translated text)
+translation_cache = TranslationCache(
+    os.path.join(cache_dir, "translations.sqlite3"),
+    ttl_seconds=float(config.get("translation_cache_ttl_days", 30)) * 24 * 3600,
+    max_entries=int(config.get("translation_cache_max_entries", 5000))
+)
+
+# Shared asyncio client (pooled connections, deadlines, retries, adaptive concurrency)
+api = openai_client.OpenAIClient(
+    api_key=openai.api_key,
+    base_url=config.get("openai_base_url") or None,
+    timeout=float(config.get("openai_timeout", 60)),
+    max_concurrency=int(config.get("openai_max_concurrency", 4)),
+    max_retries=int(config.get("openai_max_retries", 4))
+)
+
+# Scratch buffers for intermediate audio (RAM up to the budget, then spilled to TEMP_DIR)
+scratch.arena.memory_budget = int(config.get("scratch_memory_mb", 64)) * 1024 * 1024
+
+def collect_metrics():
+    """Cache, API and scratch statistics for the /metrics route."""
+    for name, stats in (("audio", audio_cache.stats()), ("translation", translation_cache.stats())):
+        yield "cache_hits_total", "counter", {"cache": name}, stats["hits"]
+        yield "cache_misses_total", "counter", {"cache": name}, stats["misses"]
+    yield "audio_cache_size_bytes", "gauge", {}, audio_cache.stats()["size_bytes"]
+    for key, value in api.stats.items():
+        yield f"openai_{key}_total", "counter", {}, value
+    arena = scratch.arena.stats()
+    for key in ("live_buffers", "memory_bytes", "tmpfs_bytes", "disk_bytes"):
+        yield f"scratch_{key}", "gauge", {}, arena[key]
+    yield "scratch_spills_total", "counter", {}, arena["spills"]
+
+metrics.registry.register_collector(collect_metrics)
+
+# Worker pool for rendering (translate -> TTS -> PA effect) of individual languages
+render_executor = ThreadPoolExecutor(max_workers=int(config.get("render_workers", 4)), thread_name_prefix="render")
+metrics.registry.register_queue("render", lambda: render_executor._work_queue.qsize())
+
 def check():
     """Check OpenAI API key only if using OpenAI generator."""
     config = load_config()  # Reload config to ensure it's up-to-date
@@ -167,102 +179,68 @@ def check():
         config["announcement_generator"] = "free"
     return config
 
-def generate_white_noise(duration_ms, volume_db=-30):
-    sample_rate = 16000
-    samples = np.random.normal(0, 1, int(sample_rate * duration_ms / 1000)).astype(np.int16)
-    noise = AudioSegment(samples.tobytes(), frame_rate=sample_rate, sample_width=2, channels=1)
-    return noise - abs(volume_db)
-
-def butter_params(low_freq, high_freq, fs, order=6):
-    nyq = 0.5 * fs
-    low = low_freq / nyq
-    high = high_freq / nyq
-    b, a = butter(order, [low, high], btype='band')
-    return b, a
-
-def butter_bandpass_filter(data, low_freq, high_freq, fs, order=6):
-    b, a = butter_params(low_freq, high_freq, fs, order=order)
-    return lfilter(b, a, data)
-
-def apply_pa_system_effect(filename):
-    try:
-        sound = AudioSegment.from_mp3(filename)
-        # Upravíme cesty k dočasným souborům
-        wav_filename = os.path.join(TEMP_DIR, os.path.basename(filename).replace(".mp3", ".wav"))
-        sound.export(wav_filename, format="wav")
-        fs, audio_data = read(wav_filename)
-        filtered_signal = butter_bandpass_filter(audio_data, 300, 3000, fs, order=6)
-        filtered_wav_filename = os.path.join(TEMP_DIR, os.path.basename(filename).replace(".mp3", "_radio.wav"))
-        write(filtered_wav_filename, fs, np.array(filtered_signal, dtype=np.int16))
-        sound = AudioSegment.from_wav(filtered_wav_filename)
-        white_noise = generate_white_noise(len(sound), volume_db=-30)
-        final_sound = sound.overlay(white_noise)
-        filtered_filename = os.path.join(TEMP_DIR, os.path.basename(filename).replace(".mp3", "_pa.mp3"))
-        final_sound.export(filtered_filename, format="mp3", bitrate="24k")
-        # Clean up temporary files
-        for temp_file in [wav_filename, filtered_wav_filename]:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        return filtered_filename
-    except Exception as e:
-        logger.error(f"Failed to apply PA system effect to {filename}: {e}")
-        return filename
-
-def apply_airport_pa_effect(filename):
-    """Apply airport PA effect to the audio file with a cathedral-like resonance."""
-    try:
-        logger.info(f"Applying airport PA effect to {filename}...")
-        # Načtení zvuku
-        sound = AudioSegment.from_mp3(filename)
-        wav_filename = os.path.join(TEMP_DIR, os.path.basename(filename).replace(".mp3", ".wav"))
-        sound.export(wav_filename, format="wav")
-        
-        # Aplikace frekvenčního filtru (rozšíříme pásmo pro jasnější zvuk)
-        fs, audio_data = read(wav_filename)
-        filtered_signal = butter_bandpass_filter(audio_data, 150, 4000, fs, order=6)  # Rozšířené pásmo 150-4000 Hz
-        write(wav_filename, fs, np.array(filtered_signal, dtype=np.int16))
-        filtered_sound = AudioSegment.from_wav(wav_filename)
-
-        # Přidání dvou ozvěn pro "katedrální" efekt
-        delay_1_ms = 100  # První ozvěna po 100 ms
-        delay_2_ms = 250  # Druhá ozvěna po 250 ms
-
-        # Vytvoření ozvěn s různými útlumy
-        silence_1 = AudioSegment.silent(duration=delay_1_ms)
-        silence_2 = AudioSegment.silent(duration=delay_2_ms)
-
-        echo_1 = filtered_sound - 10  # První ozvěna o 10 dB tišší
-        echo_2 = filtered_sound - 15  # Druhá ozvěna o 15 dB tišší
-
-        delayed_echo_1 = silence_1 + echo_1
-        delayed_echo_2 = silence_2 + echo_2
-
-        # Kombinace původního zvuku s ozvěnami
-        sound_with_echo = filtered_sound.overlay(delayed_echo_1)
-        sound_with_echo = sound_with_echo.overlay(delayed_echo_2)
-
-        # Přidání jemného šumu simulujícího ruch na letišti
-        white_noise = generate_white_noise(len(sound_with_echo), volume_db=-35)  # Tišší šum (-35 dB)
-        final_sound = sound_with_echo.overlay(white_noise)
-
-        # Export výsledného zvuku
-        filtered_filename = os.path.join(TEMP_DIR, os.path.basename(filename).replace(".mp3", "_airport_pa.mp3"))
-        final_sound.export(filtered_filename, format="mp3", bitrate="32k")
-
-        # Vyčištění dočasných souborů
-        if os.path.exists(wav_filename):
-            os.remove(wav_filename)
-        logger.info(f"Airport PA effect applied, saved as: {filtered_filename}")
-        return filtered_filename
-    except Exception as e:
-        logger.error(f"Failed to apply airport PA effect to {filename}: {e}")
-        return filename
-
-def find_safety_videos(icao_code):
-    if not os.path.exists(SAFETY_VIDEO_DIR):
-        logger.error(f"Folder '{SAFETY_VIDEO_DIR}' doesn't exist!")
-        return []
-    videos = [os.path.join(SAFETY_VIDEO_DIR, file) for file in os.listdir(SAFETY_VIDEO_DIR) if file.startswith(icao_code)]
+def apply_pa_system_effect_bytes(data, format="mp3"):
+    """Apply the cabin PA effect to encoded audio in memory and return mp3 bytes."""
+    with metrics.registry.span("decode"):
+        samples, fs = audio_effects.decode(data, format=format)
+    with metrics.registry.span("effect", effect="pa"):
+        processed = audio_effects.pa_system_effect(samples, fs)
+    with metrics.registry.span("encode"):
+        return audio_effects.encode(processed, fs, format="mp3", bitrate="24k")
+
+def cleanup_audio_files(audio_files):
+    """Release scratch buffers; paths (cached or source files) and streams are left alone."""
+    for file in audio_files:
+        if isinstance(file, scratch.ScratchBuffer):
+            logger.debug(f"Releasing scratch buffer: {file}")
+            file.release()
+
+AIRPORT_RENDER_RATE = 24000  # Vzorkovací frekvence výstupu TTS
+
+def airport_impulse_response(config, fs):
+    """Impulse response for the terminal reverb: airport_reverb_ir from config.json or the built-in echoes."""
+    ir_path = audio_effects.impulse_response_file(config.get("airport_reverb_ir", ""))
+    if ir_path:
+        try:
+            return audio_effects.load_impulse_response(ir_path, fs)
+        except Exception as e:
+            logger.error(f"Failed to load impulse response {ir_path}: {e}. Using default echoes.")
+    return audio_effects.echo_impulse_response(fs)
+
+def render_airport_announcement(config, phase, rendered):
+    """Assemble chime + languages + chime as PCM, apply the airport PA once and encode a single mp3.
+
+    ``rendered`` yields (lang, filename) of dry (no cabin PA) voice recordings in playback order.
+    """
+    fs = AIRPORT_RENDER_RATE
+    parts = []
+    chime_start = chime_cache.chimes.get(config.get("chime_start", "none"), fs)
+    if chime_start is not None:
+        parts.append(chime_start)
+        logger.info(f"Adding chime at start: {config.get('chime_start')}")
+    for lang, filename in rendered:
+        if not filename:
+            continue
+        with metrics.registry.span("decode"):
+            samples, voice_fs = audio_effects.decode(filename.source() if isinstance(filename, scratch.ScratchBuffer) else filename)
+        parts.append(audio_effects.resample(audio_effects.to_mono(samples), voice_fs, fs))
+        cleanup_audio_files([filename])
+    if len(parts) == (1 if chime_start is not None else 0):
+        return None
+    chime_end = chime_cache.chimes.get(config.get("chime_end", "none"), fs)
+    if chime_end is not None:
+        parts.append(chime_end)
+        logger.info(f"Adding chime at end: {config.get('chime_end')}")
+    with metrics.registry.span("effect", effect="airport"):
+        processed = audio_effects.airport_pa_effect(np.concatenate(parts), fs, impulse_response=airport_impulse_response(config, fs))
+    with metrics.registry.span("encode"):
+        encoded = audio_effects.encode(processed, fs, format="mp3", bitrate="32k")
+    combined = scratch.arena.put(encoded, ".mp3", name=f"announcement_{phase}_combined")
+    logger.info(f"Airport announcement rendered into: {combined}")
+    return combined
+
+def find_safety_videos(icao_code, aircraft=None):
+    videos = safety_video_index.videos.find(icao_code, aircraft)
     if not videos:
         logger.warning(f"No video found for {icao_code}.")
     return videos
@@ -270,48 +248,67 @@ def find_safety_videos(icao_code):
 def apply_distant_safety_effect(file_path):
     try:
         logger.info(f"Applying sound effect (distant) to {file_path}...")
-        sound = AudioSegment.from_file(file_path)
-        if sound.channels > 1:
-            sound = sound.set_channels(1)
-        filtered_sound = sound.low_pass_filter(400).low_pass_filter(250)
-        filtered_sound = filtered_sound + 6
-        stereo_sound = AudioSegment.from_mono_audiosegments(filtered_sound, filtered_sound)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav", dir=TEMP_DIR) as temp_wav:
-            temp_wav_path = temp_wav.name
-            stereo_sound.export(temp_wav_path, format="wav")
-        logger.info(f"Effect applied, saved to: {temp_wav_path}")
-        return temp_wav_path
+        with metrics.registry.span("decode"):
+            sound = AudioSegment.from_file(file_path)
+        with metrics.registry.span("effect", effect="distant"):
+            if sound.channels > 1:
+                sound = sound.set_channels(1)
+            filtered_sound = sound.low_pass_filter(400).low_pass_filter(250)
+            filtered_sound = filtered_sound + 6
+            stereo_sound = AudioSegment.from_mono_audiosegments(filtered_sound, filtered_sound)
+        with metrics.registry.span("encode"):
+            wav = io.BytesIO()
+            stereo_sound.export(wav, format="wav")
+        buffer = scratch.arena.put(wav.getvalue(), ".wav", name=os.path.basename(file_path) + "_distant")
+        logger.info(f"Effect applied: {buffer}")
+        return buffer
     except Exception as e:
         logger.error(f"Failed to apply distant safety effect to {file_path}: {e}")
         return None
 
+SAFETY_STREAM_RATE = 44100
+
+def play_safety_video_streaming(video_path):
+    """Decode, filter and play the safety video chunk by chunk with bounded memory."""
+    chunks = audio_effects.stream_decode(video_path, fs=SAFETY_STREAM_RATE, channels=1)
+    stream = ((chunk, SAFETY_STREAM_RATE) for chunk in audio_effects.distant_effect_stream(chunks, SAFETY_STREAM_RATE))
+    started = time.time()
+    item = playback.play([stream], name=f"safety video {os.path.basename(video_path)}", announcement="Safety")
+    item.started.wait()
+    if item.status == "playing":
+        logger.info(f"Safety video playback started after {time.time() - started:.2f}s")
+    status = item.wait()
+    if status == "failed" or (status == "finished" and item.started_at is None):
+        # Prázdný nebo přerušený ffmpeg stream skončí "finished", aniž by zazněl jediný vzorek
+        raise RuntimeError(f"Playback of {video_path} failed")
+    logger.info(f"Safety video playback {status}.")
+
 def play_safety_video(video_path):
     if not os.path.exists(video_path):
         logger.error(f"File {video_path} does not exist!")
         return
+    # Audio připravené předem (viz safety_video_index) hraje okamžitě
+    prepared = safety_video_index.videos.stream(video_path)
+    if prepared is not None:
+        status = playback.play([prepared], name=f"safety video {os.path.basename(video_path)}", announcement="Safety").wait()
+        logger.info(f"Prepared safety video playback {status}.")
+        return
+    if load_config().get("safety_video_streaming", True):
+        try:
+            play_safety_video_streaming(video_path)
+            return
+        except Exception as e:
+            logger.error(f"Streaming playback of {video_path} failed: {e}. Falling back to full decode.")
     processed_audio = apply_distant_safety_effect(video_path)
     if not processed_audio:
         logger.warning("Unable to apply effect. Using original file.")
         processed_audio = video_path
     try:
-        sound = AudioSegment.from_file(processed_audio)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav", dir=TEMP_DIR) as temp_wav:
-            temp_wav_path = temp_wav.name
-            sound.set_frame_rate(44100).set_channels(1).set_sample_width(2).export(temp_wav_path, format="wav")
-        processed_audio = temp_wav_path
-        logger.info(f"Sound converted to the right format: {processed_audio}")
-        pygame.mixer.init()
-        pygame.mixer.music.load(processed_audio)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
+        playback.play([processed_audio], name=f"safety video {os.path.basename(video_path)}", announcement="Safety").wait()
     except Exception as e:
         logger.error(f"Error when playing safety video {processed_audio}: {e}")
     finally:
-        pygame.mixer.quit()
-        # Clean up temporary files
-        if os.path.exists(processed_audio):
-            os.remove(processed_audio)
+        cleanup_audio_files([processed_audio])
         logger.info(f"Audio playback finished. Temporary files cleaned up.")
 
 def generate_safety_announcement_text(aircraft_type):
@@ -339,52 +336,20 @@ def play_safety_announcement(aircraft_type, selected_video=None, primary_lang="e
         return
     logger.info(f"Generating safety announcement for {aircraft_type}...")
     base_text = generate_safety_announcement_text(aircraft_type)
+    events.hub.publish("announcement", {"phase": "Safety", "state": "rendering", "generator": generator}, key="Safety")
     if generator == "openai":
         config = check()
         langs_to_generate = [primary_lang] + secondary_langs
-        audio_files = []
-        for lang in langs_to_generate:
-            try:
-                translated_text = translate_and_rephrase_announcement(base_text, lang, "professional")
-                filename = f"safety_announcement_{lang}.mp3"
-                # Upravíme cestu k souboru
-                temp_filename = os.path.join(TEMP_DIR, filename)
-                filtered_filename = generate_announcement(config, translated_text, voice_crew, filename)
-                audio_files.append(filtered_filename)
-            except Exception as e:
-                logger.error(f"Failed to generate safety announcement for {lang}: {e}")
-                continue
-        try:
-            pygame.mixer.init()
-            for idx, file in enumerate(audio_files):
-                pygame.mixer.music.load(file)
-                pygame.mixer.music.play()
-                while pygame.mixer.music.get_busy():
-                    pygame.time.Clock().tick(10)
-                if idx < len(audio_files) - 1:
-                    time.sleep(2)
-        except Exception as e:
-            logger.error(f"Error playing safety announcements: {e}")
-        finally:
-            pygame.mixer.quit()
-            # Clean up audio files
-            for file in audio_files:
-                if os.path.exists(file):
-                    os.remove(file)
+        futures = submit_language_renders(config, base_text, langs_to_generate, "professional", voice_crew, "safety_announcement")
+        play_rendered_in_order(futures, langs_to_generate, gap_seconds=2, name="safety announcement", announcement="Safety")
     elif generator == "free":
-        logger.info("Initializing pyttsx3 (offline TTS for safety announcement)...")
-        try:
-            engine = pyttsx3.init()
-            voices = engine.getProperty('voices')
-            female_voice = next((voice for voice in voices if "female" in voice.name.lower()), voices[1])
-            logger.info(f"Free offline safety announcement: {base_text}")
-            engine.setProperty('rate', 125)
-            engine.setProperty('volume', 1.0)
-            engine.setProperty('voice', female_voice.id)
-            engine.say(base_text)
-            engine.runAndWait()
-        except Exception as e:
-            logger.error(f"Failed to play safety announcement with pyttsx3: {e}")
+        logger.info(f"Free offline safety announcement: {base_text}")
+        filename = generate_offline_announcement(base_text, "female", 125, "safety_announcement.wav")
+        if filename:
+            try:
+                playback.play([filename], name="safety announcement", announcement="Safety").wait()
+            finally:
+                cleanup_audio_files([filename])
     logger.info("Safety demo done.")
 
 def clean_text(text):
@@ -394,39 +359,274 @@ def clean_text(text):
 
 def translate_and_rephrase_announcement(text, lang, style):
     text = clean_text(text)
+    cached = translation_cache.get(text, lang, style, TRANSLATION_MODEL)
+    if cached is not None:
+        logger.info(f"Using cached translation for {lang} ({style})")
+        return cached
     prompt = f"Translate and rephrase the following announcement into {lang} in a {style} style:\n\n{text}"
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an airline captain rephrasing announcements for passengers."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content.strip()
+        with metrics.registry.span("translate"):
+            translated_text = api.chat(
+                model=TRANSLATION_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are an airline captain rephrasing announcements for passengers."},
+                    {"role": "user", "content": prompt}
+                ]
+            ).strip()
+        translation_cache.put(text, lang, style, TRANSLATION_MODEL, translated_text)
+        return translated_text
     except Exception as e:
         logger.error(f"Failed to translate announcement to {lang}: {e}")
         return text  # Fallback to original text
 
-def generate_announcement(config, text, voice, filename, speed=1.0):
-    logger.info(f"Generating announcement: ({voice}, speed: {speed}x)")
-    # Upravíme cestu k souboru, aby vedla do složky temp
-    temp_filename = os.path.join(TEMP_DIR, filename)
+def parse_batch_translation(content, langs):
+    """Parse the JSON answer of a batched translation; returns {lang: text} for valid languages only."""
+    # Model občas obalí JSON do ```json bloku, vezmeme jen samotný objekt
+    try:
+        data = json.loads(content[content.find("{"):content.rfind("}") + 1])
+    except ValueError as e:
+        logger.error(f"Batched translation is not valid JSON: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    lowered = {str(key).strip().lower(): value for key, value in data.items()}
+    result = {}
+    for lang in langs:
+        value = lowered.get(lang.lower())
+        if isinstance(value, str) and value.strip():
+            result[lang] = value.strip()
+        else:
+            logger.warning(f"Batched translation is missing {lang}")
+    return result
+
+def translate_announcement_batch(text, langs, style):
+    """Translate one announcement into several languages with a single chat completion.
+
+    Cached languages are skipped; valid results are stored in the translation
+    cache, so render_language picks them up and only falls back to a
+    per-language request for the languages that failed here.
+    """
+    text = clean_text(text)
+    missing = [lang for lang in dict.fromkeys(langs) if translation_cache.get(text, lang, style, TRANSLATION_MODEL) is None]
+    if len(missing) < 2:
+        return
+    prompt = (
+        f"Translate and rephrase the following announcement into each of these languages in a {style} style: "
+        f"{', '.join(missing)}.\n"
+        f"Answer only with a JSON object whose keys are exactly these language names and whose values are the announcements.\n\n{text}"
+    )
+    try:
+        logger.info(f"Translating announcement into {', '.join(missing)} in one request")
+        with metrics.registry.span("translate"):
+            content = api.chat(
+                model=TRANSLATION_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are an airline captain rephrasing announcements for passengers."},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+        translations = parse_batch_translation(content, missing)
+    except Exception as e:
+        logger.error(f"Batched translation failed: {e}")
+        return
+    for lang, translated_text in translations.items():
+        translation_cache.put(text, lang, style, TRANSLATION_MODEL, translated_text)
+    failed = [lang for lang in missing if lang not in translations]
+    if failed:
+        logger.warning(f"Falling back to per-language translation for: {', '.join(failed)}")
+
+def prepare_translations(config, text, langs, style):
+    if config.get("batch_translation", True) and len(langs) > 1:
+        translate_announcement_batch(text, langs, style)
+
+def tts_cache_key(text, voice, speed, effect="pa"):
+    return audio_cache.make_key(text=text, voice=voice, speed=speed, model=TTS_MODEL, effect=effect)
+
+def stream_announcement(config, text, voice, speed=1.0):
+    """Start a streaming TTS request with the cabin PA applied chunk by chunk.
+
+    Returns an iterator of (samples, frame_rate) chunks for the playback engine.
+    The request runs on its own thread, so audio keeps arriving even before
+    playback starts; once complete, the whole clip is stored in the audio cache.
+    """
+    chunks = queue.Queue()
+    cache_key = tts_cache_key(text, voice, speed)
+
+    def receive():
+        processed = []
+        try:
+            started = time.time()
+            effect = audio_effects.StreamingPaEffect(TTS_PCM_RATE)
+            remainder = b""
+            for data in api.stream_speech(
+                model=TTS_MODEL,
+                voice=voice,
+                text=text,
+                speed=speed,
+                response_format="pcm",
+                chunk_size=TTS_STREAM_CHUNK_BYTES
+            ):
+                data = remainder + data
+                usable = len(data) - len(data) % 2
+                remainder = data[usable:]
+                if not usable:
+                    continue
+                with metrics.registry.span("effect", effect="pa_stream"):
+                    chunk = effect.process(np.frombuffer(data[:usable], dtype=np.int16).astype(np.float64))
+                if not processed:
+                    metrics.registry.observe("tts_first_chunk", time.time() - started)
+                    logger.info(f"First streamed audio after {time.time() - started:.2f}s ({voice})")
+                processed.append(chunk)
+                chunks.put(chunk)
+            chunks.put(None)
+            metrics.registry.observe("tts", time.time() - started)
+            if processed:
+                with metrics.registry.span("encode"):
+                    encoded = audio_effects.encode(np.concatenate(processed), TTS_PCM_RATE, format="mp3", bitrate="24k")
+                audio_cache.put_bytes(cache_key, encoded)
+        except Exception as e:
+            logger.error(f"Streaming TTS failed after {len(processed)} chunks: {e}")
+            chunks.put(None)
+
+    threading.Thread(target=receive, name="tts-stream", daemon=True).start()
+
+    def iterate():
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            # Co už čeká ve frontě, pošleme jako jeden zvuk
+            pending = [chunk]
+            while not chunks.empty():
+                chunk = chunks.get()
+                if chunk is None:
+                    yield np.concatenate(pending), TTS_PCM_RATE
+                    return
+                pending.append(chunk)
+            yield np.concatenate(pending), TTS_PCM_RATE
+
+    return iterate()
+
+def generate_announcement(config, text, voice, filename, speed=1.0, effect="pa"):
+    """Synthesize text and return the path of the cached mp3; effect="pa" applies the cabin PA, None keeps the dry voice."""
+    logger.info(f"Generating announcement: ({voice}, speed: {speed}x, effect: {effect})")
+    cache_key = tts_cache_key(text, voice, speed, effect)
+    cached_filename = audio_cache.get(cache_key)
+    if cached_filename:
+        logger.info(f"Using cached announcement: {cached_filename} (cache: {audio_cache.stats()})")
+        return cached_filename
+    try:
+        with metrics.registry.span("tts"):
+            content = api.speech(
+                model=TTS_MODEL,
+                voice=voice,
+                text=text,
+                speed=speed
+            )
+        if effect is None:
+            logger.info(f"Announcement received ({len(content)} bytes)")
+            return audio_cache.put_bytes(cache_key, content)
+        logger.info(f"Announcement received ({len(content)} bytes), applying PA effect")
+        try:
+            return audio_cache.put_bytes(cache_key, apply_pa_system_effect_bytes(content))
+        except Exception as e:
+            # PA efekt selhal, necacheujeme nefiltrovaný zvuk
+            logger.error(f"Failed to apply PA system effect to {filename}: {e}")
+            return scratch.arena.put(content, ".mp3", name=filename)
+    except Exception as e:
+        logger.error(f"Failed to generate announcement {filename}: {e}")
+        return None
+
+def generate_offline_announcement(text, voice, rate, filename, effect="pa"):
+    """Offline counterpart of generate_announcement: render with the pyttsx3 worker and return the cached file."""
+    logger.info(f"Generating offline announcement: ({voice}, rate: {rate}, effect: {effect})")
+    cache_key = audio_cache.make_key(text=text, voice=voice, speed=rate, model=OFFLINE_TTS_MODEL, effect=effect)
+    ext = ".mp3" if effect == "pa" else ".wav"
+    cached_filename = audio_cache.get(cache_key, ext)
+    if cached_filename:
+        logger.info(f"Using cached announcement: {cached_filename} (cache: {audio_cache.stats()})")
+        return cached_filename
     try:
-        response = openai.audio.speech.create(
-            model="tts-1",
-            voice=voice,
-            input=text,
-            speed=speed
-        )
-        with open(temp_filename, "wb") as f:
-            f.write(response.content)
-        logger.info(f"Announcement saved as: {temp_filename}")
-        return apply_pa_system_effect(temp_filename)
+        with scratch.arena.file(".wav", name=filename) as wav:
+            with metrics.registry.span("tts"):
+                offline_tts.get_worker().render(text, voice, rate, wav.path)
+            if effect is None:
+                return audio_cache.put(cache_key, wav.path, ext)
+            processed = apply_pa_system_effect_bytes(wav.read(), format=None)
+        return audio_cache.put_bytes(cache_key, processed)
     except Exception as e:
-        logger.error(f"Failed to generate announcement for {temp_filename}: {e}")
+        logger.error(f"Failed to generate offline announcement {filename}: {e}")
         return None
 
+def render_language(config, text, lang, style, voice, filename, speed=1.0, effect="pa"):
+    """Translate and render one language; runs on render_executor."""
+    logger.info(f"Generating announcement for language: {lang}")
+    translated_text = translate_and_rephrase_announcement(text, lang, style)
+    return generate_announcement(config, translated_text, voice, filename, speed, effect)
+
+def render_language_streaming(config, text, lang, style, voice, filename, speed=1.0):
+    """Like render_language, but returns a live PA-processed stream when the audio is not cached yet."""
+    logger.info(f"Generating streamed announcement for language: {lang}")
+    translated_text = translate_and_rephrase_announcement(text, lang, style)
+    cached_filename = audio_cache.get(tts_cache_key(translated_text, voice, speed))
+    if cached_filename:
+        return cached_filename
+    return stream_announcement(config, translated_text, voice, speed)
+
+def submit_language_renders(config, text, langs, style, voice, filename_prefix, speed=1.0):
+    """Submit renders for all languages; the first one is streamed when streaming_tts is enabled."""
+    prepare_translations(config, text, langs, style)
+    futures = []
+    for idx, lang in enumerate(langs):
+        filename = f"{filename_prefix}_{lang}.mp3"
+        if idx == 0 and config.get("streaming_tts", True):
+            futures.append(render_executor.submit(render_language_streaming, config, text, lang, style, voice, filename, speed))
+        else:
+            futures.append(render_executor.submit(render_language, config, text, lang, style, voice, filename, speed))
+    return futures
+
+def wait_for_rendered(futures, langs):
+    """Yield (lang, filename) in the given order as soon as each language is ready."""
+    for lang, future in zip(langs, futures):
+        try:
+            filename = future.result()
+        except Exception as e:
+            logger.error(f"Failed to generate announcement for {lang}: {e}")
+            filename = None
+        if isinstance(filename, (str, scratch.ScratchBuffer)):
+            logger.info(f"Generated audio file: {filename}")
+        elif filename:
+            logger.info(f"Streaming audio for language {lang}")
+        else:
+            logger.warning(f"Failed to generate audio for language {lang}")
+        yield lang, filename
+
+def observe_playback_start(item, requested_at):
+    """Record the time from the announcement request to its first audible sample."""
+    if requested_at is not None and item.started_at is not None:
+        metrics.registry.observe("playback_start", item.started_at - requested_at)
+
+def play_rendered_in_order(futures, langs, gap_seconds=2, priority=playback.PRIORITY_ANNOUNCEMENT, name="", requested_at=None, announcement=None):
+    """Play rendered languages in order, starting with the first one while the rest still render."""
+    audio_files = []
+    item = playback.get_engine().open(priority, name, announcement)
+    try:
+        for lang, file in wait_for_rendered(futures, langs):
+            if not file:
+                continue
+            if audio_files:
+                item.append(gap_seconds)
+            audio_files.append(file)
+            item.append(file)
+    finally:
+        item.close()
+    status = item.wait()
+    observe_playback_start(item, requested_at)
+    if status != "finished":
+        logger.warning(f"Playback of {name or 'announcement'} {status}.")
+    cleanup_audio_files(audio_files)
+    return audio_files
+
 def generate_beverage_service_info(beverage_service):
     if beverage_service == "dry":
         return "Non-alcoholic beverages will be available during the flight."
@@ -443,6 +643,82 @@ def generate_food_and_beverage_info(food_options, beverage_service):
         return f"{food_info} {beverage_info}"
     return food_info or beverage_info or "No food or beverage service information available."
 
+def round_local_time(local_time, minutes=LOCAL_TIME_ROUND_MINUTES):
+    """Round "HH:MM" to the nearest ``minutes``, so the text does not change every minute and can be pre-rendered."""
+    try:
+        hours, mins = (int(part) for part in local_time.split(":")[:2])
+    except ValueError:
+        return local_time
+    total = round((hours * 60 + mins) / minutes) * minutes % (24 * 60)
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+def format_announcement_text(phase, flight_info, flight_data):
+    """Return the announcement text for a phase with all placeholders filled in, or None."""
+    template = announcement_templates.get(phase)
+    if not template:
+        logger.warning(f"No announcement text found for phase {phase}.")
+        return None
+
+    # Přidání food_and_beverage_info a beverage_service_info do flight_info
+    food_options = flight_info.get("food_options", "")
+    beverage_service = flight_info.get("beverage_service", "")
+    flight_info["food_and_beverage_info"] = generate_food_and_beverage_info(food_options, beverage_service)
+    flight_info["beverage_service_info"] = generate_beverage_service_info(beverage_service)
+
+    values = {**flight_info, **flight_data}
+
+    # Formátování local_time na HH:MM (flight_data je neměnný snímek, upravujeme jen hodnoty pro šablonu)
+    local_time = values.get("local_time") or time.strftime('%H:%M')
+    if ":" in local_time:
+        # Pokud je formát HH:MM:SS, ořízneme sekundy
+        local_time = round_local_time(local_time[:5])  # Vezmeme pouze první 5 znaků (HH:MM)
+    values["local_time"] = local_time
+    if isinstance(values.get("temperature"), float):
+        # Celé stupně - hlášení se nemění s každou setinou a dá se předem vyrenderovat
+        values["temperature"] = round(values["temperature"])
+
+    try:
+        formatted_text = template.render(values)
+        logger.info(f"Formatted announcement text: {formatted_text}")
+        return formatted_text
+    except Exception as e:
+        logger.error(f"Unexpected error during placeholder replacement: {e}")
+        return None
+
+def announcement_languages(phase, flight_info, all_langs_sorted, airport_langs):
+    """Languages (in playback order) used for an announcement of the given phase."""
+    if phase == "AirportBoarding" or phase == "LastCall":  # LastCall je letištní hlášení
+        return airport_langs
+    if phase in MULTILINGUAL_ANNOUNCEMENTS:  # InflightService je multijazyčné
+        return all_langs_sorted
+    return [flight_info.get("primary_lang", "english")]
+
+def announcement_voice(phase):
+    """Return (voice, speed) for the given phase."""
+    if phase in ["AirportBoarding", "LastCall"]:
+        return airport_voices[phase], 1.2
+    if phase in ["TaxiAfterLanding", "InflightService"]:
+        return voice_crew, 1.0
+    return voice_captain, 1.0
+
+def offline_voice(phase):
+    """Return (voice, rate) of the offline generator for the given phase."""
+    if phase in ["AirportBoarding", "LastCall"]:
+        return "female", 150
+    return "male", 125
+
+def play_announcement_files(phase, audio_files, requested_at=None):
+    """Play the final audio of an announcement (LastCall preempts everything else) and clean it up."""
+    priority = playback.PRIORITY_URGENT if phase == "LastCall" else playback.PRIORITY_ANNOUNCEMENT
+    try:
+        item = playback.play(audio_files, priority, name=f"{phase} announcement", announcement=phase)
+        item.wait()
+        observe_playback_start(item, requested_at)
+    except Exception as e:
+        logger.error(f"Error playing announcements: {e}")
+    finally:
+        cleanup_audio_files(audio_files)
+
 def play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport_langs, airport_order, style):
     # Ladící výpis pro kontrolu vstupních parametrů
     logger.info(f"Starting play_announcement for phase: {phase}")
@@ -453,6 +729,8 @@ def play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport
     logger.debug(f"airport_order: {airport_order}")
     logger.debug(f"style: {style}")
 
+    requested_at = time.monotonic()
+
     # Kontrola, zda už hlášení nebylo přehráno
     if phase in played_announcements:
         logger.info(f"Announcement for phase {phase} already played. Skipping.")
@@ -462,180 +740,64 @@ def play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport
     generator = config.get("announcement_generator", "openai")
     logger.info(f"Announcement for phase of flight: {phase}, using generator: {generator}")
 
-    # Načtení textu hlášení
-    text = announcements.get(phase)
+    text = format_announcement_text(phase, flight_info, flight_data)
     if not text:
-        logger.warning(f"No announcement text found for phase {phase}.")
-        return
-
-    # Přidání food_and_beverage_info a beverage_service_info do flight_info
-    food_options = flight_info.get("food_options", "")
-    beverage_service = flight_info.get("beverage_service", "")
-    flight_info["food_and_beverage_info"] = generate_food_and_beverage_info(food_options, beverage_service)
-    flight_info["beverage_service_info"] = generate_beverage_service_info(beverage_service)
-    logger.debug(f"Updated flight_info with food_and_beverage_info: {flight_info['food_and_beverage_info']}")
-    logger.debug(f"Updated flight_info with beverage_service_info: {flight_info['beverage_service_info']}")
-
-    # Formátování local_time na HH:MM
-    local_time = flight_data.get("local_time", time.strftime('%H:%M'))
-    if local_time and ":" in local_time:
-        # Pokud je formát HH:MM:SS, ořízneme sekundy
-        local_time = local_time[:5]  # Vezmeme pouze první 5 znaků (HH:MM)
-    flight_data["local_time"] = local_time
-    logger.debug(f"Formatted local_time: {local_time}")
-
-    # Nahrazení placeholderů v textu
-    try:
-        formatted_text = text
-        for key, value in flight_info.items():
-            placeholder = "{" + key + "}"
-            formatted_text = formatted_text.replace(placeholder, str(value))
-            logger.debug(f"Replacing placeholder {placeholder} with {value}")
-
-        for key, value in flight_data.items():
-            placeholder = "{" + key + "}"
-            formatted_text = formatted_text.replace(placeholder, str(value))
-            logger.debug(f"Replacing placeholder {placeholder} with {value}")
-
-        text = formatted_text
-        logger.info(f"Formatted announcement text: {text}")
-    except KeyError as e:
-        logger.error(f"Missing key in flight_info or flight_data: {e}")
-        return
-    except Exception as e:
-        logger.error(f"Unexpected error during placeholder replacement: {e}")
         return
+    events.hub.publish("announcement", {"phase": phase, "state": "rendering", "generator": generator}, key=phase)
 
     # Generování hlášení
     if generator == "openai":
         config = check()
-        chime_start = config.get("chime_start", "none")
-        chime_end = config.get("chime_end", "none")
-        chime_dir = os.path.join(SCRIPT_DIR, "airport_chimes")
-        logger.debug(f"Chime settings: start={chime_start}, end={chime_end}, dir={chime_dir}")
 
         # Určení jazyků pro generování hlášení
-        if phase == "AirportBoarding" or phase == "LastCall":  # LastCall je letištní hlášení
-            langs_to_generate = airport_langs
-        elif phase in MULTILINGUAL_ANNOUNCEMENTS:  # InflightService je multijazyčné
-            langs_to_generate = all_langs_sorted
-        else:
-            langs_to_generate = [flight_info.get("primary_lang", "english")]
+        langs_to_generate = announcement_languages(phase, flight_info, all_langs_sorted, airport_langs)
         logger.info(f"Languages to generate for phase {phase}: {langs_to_generate}")
 
-        # Seznam audio souborů (včetně chime, pokud jsou nastaveny)
-        audio_files = []
-
-        # Přidání chime na začátek (pokud je nastaveno)
-        if (phase == "AirportBoarding" or phase == "LastCall") and chime_start != "none":
-            chime_start_path = os.path.join(chime_dir, chime_start)
-            if os.path.exists(chime_start_path):
-                if not chime_start_path.endswith(".mp3"):
-                    chime_start_mp3 = os.path.join(TEMP_DIR, os.path.basename(chime_start_path).replace(os.path.splitext(chime_start_path)[1], ".mp3"))
-                    AudioSegment.from_file(chime_start_path).export(chime_start_mp3, format="mp3")
-                else:
-                    chime_start_mp3 = chime_start_path
-                # Ztlumíme chime o 5 dB
-                chime_audio = AudioSegment.from_mp3(chime_start_mp3) - 5
-                chime_start_filtered = os.path.join(TEMP_DIR, os.path.basename(chime_start_mp3).replace(".mp3", "_attenuated.mp3"))
-                chime_audio.export(chime_start_filtered, format="mp3")
-                chime_start_filtered = apply_airport_pa_effect(chime_start_filtered)
-                audio_files.append(chime_start_filtered)
-                logger.info(f"Adding chime at start with PA effect: {chime_start_filtered}")
-            else:
-                logger.warning(f"Chime {chime_start_path} does not exist!")
-
-        # Generování hlášení pro každý jazyk
-        for lang in langs_to_generate:
-            logger.info(f"Generating announcement for language: {lang}")
-            translated_text = translate_and_rephrase_announcement(text, lang, style)
-            filename = f"announcement_{phase}_{lang}.mp3"
-            selected_voice = random.choice(crew_voices) if phase in ["AirportBoarding", "LastCall"] else \
-                            (voice_crew if phase in ["TaxiAfterLanding", "InflightService"] else voice_captain)
-            speed = 1.2 if phase in ["AirportBoarding", "LastCall"] else 1.0
-            logger.debug(f"Using voice: {selected_voice}, speed: {speed}")
-            filtered_filename = generate_announcement(config, translated_text, selected_voice, filename, speed)
-            if filtered_filename:
-                audio_files.append(filtered_filename)
-                logger.info(f"Generated audio file: {filtered_filename}")
-            else:
-                logger.warning(f"Failed to generate audio for language {lang}")
-
-        # Přidání chime na konec (pokud je nastaveno)
-        if (phase == "AirportBoarding" or phase == "LastCall") and chime_end != "none":
-            chime_end_path = os.path.join(chime_dir, chime_end)
-            if os.path.exists(chime_end_path):
-                if not chime_end_path.endswith(".mp3"):
-                    chime_end_mp3 = os.path.join(TEMP_DIR, os.path.basename(chime_end_path).replace(os.path.splitext(chime_end_path)[1], ".mp3"))
-                    AudioSegment.from_file(chime_end_path).export(chime_end_mp3, format="mp3")
-                else:
-                    chime_end_mp3 = chime_end_path
-                # Ztlumíme chime o 5 dB
-                chime_audio = AudioSegment.from_mp3(chime_end_mp3) - 5
-                chime_end_filtered = os.path.join(TEMP_DIR, os.path.basename(chime_end_mp3).replace(".mp3", "_attenuated.mp3"))
-                chime_audio.export(chime_end_filtered, format="mp3")
-                chime_end_filtered = apply_airport_pa_effect(chime_end_filtered)
-                audio_files.append(chime_end_filtered)
-                logger.info(f"Adding chime at end with PA effect: {chime_end_filtered}")
+        # Všechny jazyky se renderují souběžně, přehrávání začne hned jak je hotový první z nich
+        selected_voice, speed = announcement_voice(phase)
+        logger.debug(f"Using voice: {selected_voice}, speed: {speed}")
+        if phase not in ["AirportBoarding", "LastCall"]:
+            futures = submit_language_renders(config, text, langs_to_generate, style, selected_voice, f"announcement_{phase}", speed)
+            if not play_rendered_in_order(futures, langs_to_generate, gap_seconds=2, name=f"{phase} announcement", requested_at=requested_at, announcement=phase):
+                logger.warning(f"No audio files generated for phase {phase}")
+        else:
+            # Letištní hlášení se renderují bez kabinového PA efektu, letištní efekt se použije jednou na celek
+            prepare_translations(config, text, langs_to_generate, style)
+            futures = [
+                render_executor.submit(render_language, config, text, lang, style, selected_voice, f"announcement_{phase}_{lang}.mp3", speed, None)
+                for lang in langs_to_generate
+            ]
+            try:
+                final_filename = render_airport_announcement(config, phase, wait_for_rendered(futures, langs_to_generate))
+            except Exception as e:
+                logger.error(f"Failed to render airport announcement for {phase}: {e}")
+                final_filename = None
+            audio_files = [final_filename] if final_filename else []
+
+            # Přehrání audio souborů, LastCall přeruší vše ostatní
+            if audio_files:
+                play_announcement_files(phase, audio_files, requested_at)
             else:
-                logger.warning(f"Chime {chime_end_path} does not exist!")
-
-        # Kombinace audio souborů pro AirportBoarding a LastCall (včetně chime)
-        if (phase == "AirportBoarding" or phase == "LastCall") and audio_files:
-            combined_filename = os.path.join(TEMP_DIR, f"announcement_{phase}_combined.mp3")
-            combined_audio = None
-            for audio_file in audio_files:
-                audio_segment = AudioSegment.from_file(audio_file)
-                if combined_audio is None:
-                    combined_audio = audio_segment
-                else:
-                    combined_audio += audio_segment
-            combined_audio.export(combined_filename, format="mp3")
-            final_filename = apply_airport_pa_effect(combined_filename)
-            audio_files = [final_filename]
-            logger.info(f"Combined audio files into: {final_filename}")
-
-        # Přehrání audio souborů
-        if audio_files:
+                logger.warning(f"No audio files generated for phase {phase}")
+
+    # Offline generátor (pyttsx3) - bez překladu, ale stejnou cestou přes efekty, cache a přehrávač
+    elif generator == "free":
+        logger.info(f"Free offline announcement: {text}")
+        voice, rate = offline_voice(phase)
+        if phase in ["AirportBoarding", "LastCall"]:
+            dry_filename = generate_offline_announcement(text, voice, rate, f"announcement_{phase}.wav", effect=None)
             try:
-                pygame.mixer.init()
-                for idx, file in enumerate(audio_files):
-                    logger.info(f"Playing audio file: {file}")
-                    pygame.mixer.music.load(file)
-                    pygame.mixer.music.play()
-                    while pygame.mixer.music.get_busy():
-                        pygame.time.Clock().tick(10)
-                    if idx < len(audio_files) - 1 and phase not in ["AirportBoarding", "LastCall"]:
-                        time.sleep(2)
+                final_filename = render_airport_announcement(config, phase, [(flight_info.get("primary_lang", "english"), dry_filename)])
             except Exception as e:
-                logger.error(f"Error playing announcements: {e}")
-            finally:
-                pygame.mixer.quit()
-                # Clean up audio files
-                for file in audio_files:
-                    if os.path.exists(file):
-                        os.remove(file)
-                        logger.debug(f"Cleaned up audio file: {file}")
+                logger.error(f"Failed to render airport announcement for {phase}: {e}")
+                final_filename = None
+        else:
+            final_filename = generate_offline_announcement(text, voice, rate, f"announcement_{phase}.wav")
+        if final_filename:
+            play_announcement_files(phase, [final_filename], requested_at)
         else:
             logger.warning(f"No audio files generated for phase {phase}")
 
-    # Offline generátor (pyttsx3)
-    elif generator == "free":
-        logger.info("Initializing pyttsx3 (offline TTS)...")
-        try:
-            engine = pyttsx3.init()
-            voices = engine.getProperty('voices')
-            male_voice = next((voice for voice in voices if "male" in voice.name.lower()), voices[0])
-            female_voice = next((voice for voice in voices if "female" in voice.name.lower()), voices[1])
-            logger.info(f"Free offline announcement: {text}")
-            engine.setProperty('rate', 150 if phase in ["AirportBoarding", "LastCall"] else 125)
-            engine.setProperty('volume', 1.0)
-            engine.setProperty('voice', female_voice.id if phase in ["AirportBoarding", "LastCall"] else male_voice.id)
-            engine.say(text)
-            engine.runAndWait()
-        except Exception as e:
-            logger.error(f"Failed to play announcement with pyttsx3: {e}")
-
     # Označení hlášení jako přehráno
     played_announcements.add(phase)
     logger.info(f"Announcement for phase {phase} completed and marked as played.")
\ No newline at end of file
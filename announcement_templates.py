@@ -0,0 +1,137 @@
+import difflib
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+# Hodnoty, které dodává flight_info (main.py / flask_server.py), odvozené texty a živá data z flight_data
+KNOWN_PLACEHOLDERS = frozenset({
+    "captain_name", "first_officer", "flight_number", "origin", "destination", "aircraft", "airline",
+    "duration", "airline_icao", "primary_lang", "gate", "food_options", "beverage_service",
+    "food_and_beverage_info", "beverage_service_info",
+    "phase", "altitude", "speed", "vertical_speed", "temperature", "local_time",
+})
+
+# Starší názvy placeholderů, které se mapují na aktuální
+PLACEHOLDER_ALIASES = {"flight_duration": "duration"}
+
+
+class AnnouncementTemplate:
+    """One announcement compiled into literal parts and placeholder names, rendered in a single pass."""
+
+    def __init__(self, phase, text):
+        self.phase = phase
+        self.text = text
+        # split() se skupinou střídá literály (sudé indexy) a názvy placeholderů (liché)
+        self.parts = PLACEHOLDER_RE.split(text)
+        self.placeholders = frozenset(self.parts[1::2])
+        self.unknown = sorted(name for name in self.placeholders if name not in KNOWN_PLACEHOLDERS and name not in PLACEHOLDER_ALIASES)
+        self._warned = set()
+
+    def render(self, values):
+        """Fill in placeholders from ``values``; missing ones are left as-is and reported once."""
+        output = []
+        for index, part in enumerate(self.parts):
+            if index % 2 == 0:
+                output.append(part)
+                continue
+            value = values.get(part)
+            if value is None and part in PLACEHOLDER_ALIASES:
+                value = values.get(PLACEHOLDER_ALIASES[part])
+            if value is None:
+                if part not in self._warned:
+                    self._warned.add(part)
+                    logger.warning(f"No value for placeholder {{{part}}} in the {self.phase} announcement.")
+                output.append("{" + part + "}")
+            else:
+                output.append(str(value))
+        return "".join(output)
+
+
+def parse_announcements(content):
+    """Parse ``[Phase]`` blocks separated by blank lines into {phase: text}."""
+    announcements = {}
+    for announcement_block in content.strip().split("\n\n"):
+        block_lines = announcement_block.strip().split("\n")
+        if not block_lines or not block_lines[0].strip():
+            continue
+        # První řádek je klíč v hranatých závorkách, např. [Gate]
+        key_line = block_lines[0].strip()
+        if not (key_line.startswith("[") and key_line.endswith("]")):
+            logger.warning(f"Invalid announcement key format: {key_line}. Skipping.")
+            continue
+        announcements[key_line[1:-1]] = " ".join(line.strip() for line in block_lines[1:])
+    return announcements
+
+
+def compile_announcements(announcements):
+    """Compile {phase: text} into templates and report placeholders nothing will fill."""
+    templates = {}
+    for phase, text in announcements.items():
+        template = AnnouncementTemplate(phase, text)
+        for name in template.unknown:
+            suggestion = difflib.get_close_matches(name, KNOWN_PLACEHOLDERS, n=1)
+            hint = f" Did you mean {{{suggestion[0]}}}?" if suggestion else ""
+            logger.warning(f"Announcement {phase} uses unknown placeholder {{{name}}}.{hint}")
+        for name in template.placeholders & PLACEHOLDER_ALIASES.keys():
+            logger.info(f"Announcement {phase} uses {{{name}}}, filled from {{{PLACEHOLDER_ALIASES[name]}}}.")
+        templates[phase] = template
+    return templates
+
+
+class AnnouncementTemplates:
+    """Compiled announcements from announcements.txt, reloaded when the file's mtime changes.
+
+    ``defaults`` are used when the file is missing or cannot be read.
+    """
+
+    def __init__(self, path, defaults):
+        self.path = path
+        self.defaults = defaults
+        self._templates = {}
+        self._mtime = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.reload_if_changed()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        with self._lock:
+            mtime = self._file_mtime()
+            if self._loaded and mtime == self._mtime:
+                return False
+            first_load = not self._loaded
+            self._loaded = True
+            self._mtime = mtime
+            if mtime is None:
+                if first_load:
+                    logger.error(f"Announcements file '{self.path}' not found! Using default announcements.")
+                    self._templates = compile_announcements(self.defaults)
+                return first_load
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._templates = compile_announcements(parse_announcements(f.read()))
+                logger.info(f"Successfully {'loaded' if first_load else 'reloaded'} announcements from {self.path}")
+            except Exception as e:
+                # Při chybě během úprav souboru ponecháme poslední platnou verzi
+                logger.error(f"Failed to load announcements from {self.path}: {e}. Using {'default' if first_load else 'previous'} announcements.")
+                if first_load:
+                    self._templates = compile_announcements(self.defaults)
+            return True
+
+    def get(self, phase):
+        self.reload_if_changed()
+        return self._templates.get(phase)
+
+    def texts(self):
+        self.reload_if_changed()
+        return {phase: template.text for phase, template in self._templates.items()}
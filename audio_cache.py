@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCache:
+    """Content-addressed on-disk cache for rendered announcement audio.
+
+    Files are stored as ``<sha256>.<ext>`` in ``cache_dir``. The file mtime is
+    bumped on every hit, so eviction simply removes the oldest files until the
+    cache fits into ``max_bytes`` again (LRU).
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def make_key(**parts):
+        """Return a stable hash of the given render parameters."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def contains(self, path):
+        """True if ``path`` points into this cache (such files must not be deleted by callers)."""
+        try:
+            return os.path.commonpath([os.path.abspath(path), os.path.abspath(self.cache_dir)]) == os.path.abspath(self.cache_dir)
+        except ValueError:
+            return False
+
+    def get(self, key, ext=".mp3"):
+        """Return the cached file path for ``key`` or None."""
+        path = self._path(key, ext)
+        with self._lock:
+            if os.path.exists(path):
+                self.hits += 1
+                try:
+                    os.utime(path, None)
+                except OSError:
+                    pass
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key, src_path, ext=".mp3", move=True):
+        """Store ``src_path`` under ``key`` and return the cached path."""
+        path = self._path(key, ext)
+        tmp_path = path + ".tmp"
+        with self._lock:
+            if move:
+                shutil.move(src_path, tmp_path)
+            else:
+                shutil.copyfile(src_path, tmp_path)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += os.path.getsize(path) - old_size
+            self._evict()
+        return path
+
+    def put_bytes(self, key, data, ext=".mp3"):
+        """Store raw bytes under ``key`` and return the cached path."""
+        path = self._path(key, ext)
+        tmp_path = path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += len(data) - old_size
+            self._evict()
+        return path
+
+    def _evict(self):
+        if self._size <= self.max_bytes:
+            return
+        for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+                logger.debug(f"Evicted cached audio {path}")
+            except OSError as e:
+                # Soubor může být právě přehráván (Windows), zkusíme to příště
+                logger.debug(f"Could not evict {path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
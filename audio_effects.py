@@ -0,0 +1,302 @@
+import functools
+import io
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+from pydub import AudioSegment
+from scipy.signal import butter, fftconvolve, firwin, resample_poly, sosfilt
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+
+# Set up ffmpeg for pydub
+FFMPEG_DIR = os.path.join(SCRIPT_DIR, "ffmpeg", "bin")
+ffmpeg_path = os.path.join(FFMPEG_DIR, "ffmpeg.exe")
+ffprobe_path = os.path.join(FFMPEG_DIR, "ffprobe.exe")
+
+
+def _bundled_usable(path):
+    return os.path.exists(path) and (os.name == "nt" or os.access(path, os.X_OK))
+
+
+if not _bundled_usable(ffmpeg_path):
+    # Přibalené .exe jde spustit jen na Windows (např. benchmark na Linuxu použije ffmpeg ze systému)
+    ffmpeg_path = shutil.which("ffmpeg") or ffmpeg_path
+if not _bundled_usable(ffprobe_path):
+    ffprobe_path = shutil.which("ffprobe") or ffprobe_path
+AudioSegment.converter = ffmpeg_path
+AudioSegment.ffprobe = ffprobe_path
+os.environ["PATH"] += os.pathsep + FFMPEG_DIR
+
+INT16_MAX = 32767
+NOISE_BED_SECONDS = 10
+
+
+def segment_to_array(segment):
+    """Return (samples, frame_rate) of an AudioSegment as float64 in int16 scale, shape (n,) or (n, channels)."""
+    segment = segment.set_sample_width(2)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16).astype(np.float64)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels)
+    return samples, segment.frame_rate
+
+
+def array_to_segment(samples, frame_rate):
+    """Clip a float array (int16 scale) back to a 16-bit AudioSegment."""
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    pcm = np.clip(np.rint(samples), -INT16_MAX - 1, INT16_MAX).astype(np.int16)
+    return AudioSegment(pcm.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels)
+
+
+def decode(data, format=None):
+    """Decode an encoded file (path or bytes) into (samples, frame_rate)."""
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    return segment_to_array(AudioSegment.from_file(source, format=format))
+
+
+def encode(samples, frame_rate, format="mp3", bitrate=None):
+    """Encode samples into bytes of the given format."""
+    buffer = io.BytesIO()
+    array_to_segment(samples, frame_rate).export(buffer, format=format, bitrate=bitrate)
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=32)
+def bandpass_sos(low_freq, high_freq, fs, order=6):
+    """Butterworth band-pass as second-order sections, cached per sample rate and band."""
+    return butter(order, [low_freq, high_freq], btype="band", fs=fs, output="sos")
+
+
+@functools.lru_cache(maxsize=32)
+def lowpass_sos(cutoff, fs, order=1):
+    return butter(order, cutoff, btype="low", fs=fs, output="sos")
+
+
+def bandpass(samples, low_freq, high_freq, fs, order=6):
+    return sosfilt(bandpass_sos(low_freq, high_freq, fs, order), samples, axis=0)
+
+
+@functools.lru_cache(maxsize=8)
+def noise_bed(fs, seconds=NOISE_BED_SECONDS):
+    """Unit-variance white noise generated once per sample rate and looped as needed."""
+    bed = np.random.default_rng().standard_normal(int(fs * seconds))
+    bed.setflags(write=False)
+    return bed
+
+
+def add_noise(samples, fs, level_dbfs, offset=0):
+    """Mix white noise with RMS ``level_dbfs`` (relative to int16 full scale) into samples.
+
+    ``offset`` is the position in the looped noise bed, used by streaming callers
+    so consecutive chunks do not repeat the same noise.
+    """
+    if len(samples) == 0:
+        return samples
+    bed = noise_bed(fs)
+    noise = np.take(bed, np.arange(offset, offset + len(samples)), mode="wrap") * (INT16_MAX * 10 ** (level_dbfs / 20))
+    if samples.ndim > 1:
+        noise = noise[:, None]
+    return samples + noise
+
+
+def pa_system_effect(samples, fs, low_freq=300, high_freq=3000, noise_dbfs=-50):
+    """Cabin PA: narrow band-pass with a faint hiss."""
+    return add_noise(bandpass(samples, low_freq, high_freq, fs), fs, noise_dbfs)
+
+
+def to_mono(samples):
+    return samples.mean(axis=1) if samples.ndim > 1 else samples
+
+
+def resample(samples, fs_from, fs_to):
+    if fs_from == fs_to:
+        return samples
+    divisor = math.gcd(int(fs_from), int(fs_to))
+    return resample_poly(samples, int(fs_to) // divisor, int(fs_from) // divisor, axis=0)
+
+
+def gain(samples, gain_db):
+    return samples * 10 ** (gain_db / 20)
+
+
+@functools.lru_cache(maxsize=8)
+def echo_impulse_response(fs, echoes=((100, -10), (250, -15))):
+    """Impulse response made of the direct sound plus discrete echoes (delay ms, gain dB)."""
+    length = int(fs * max((delay for delay, _ in echoes), default=0) / 1000) + 1
+    ir = np.zeros(length)
+    ir[0] = 1.0
+    for delay_ms, gain_db in echoes:
+        ir[int(fs * delay_ms / 1000)] += 10 ** (gain_db / 20)
+    ir.setflags(write=False)
+    return ir
+
+
+@functools.lru_cache(maxsize=8)
+def impulse_response_file(path):
+    """Absolute path of a configured impulse response (relative to SCRIPT_DIR); None when none is set."""
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(SCRIPT_DIR, path)
+
+
+def load_impulse_response(path, fs):
+    """Load a recorded impulse response, mix it to mono, resample to ``fs`` and normalise its peak to 1."""
+    samples, ir_fs = decode(path)
+    ir = resample(to_mono(samples), ir_fs, fs)
+    peak = np.max(np.abs(ir))
+    if peak > 0:
+        ir = ir / peak
+    ir.setflags(write=False)
+    return ir
+
+
+def convolution_reverb(samples, impulse_response):
+    """Vectorised FFT convolution; the output is longer by the reverb tail."""
+    if samples.ndim > 1:
+        return fftconvolve(samples, impulse_response[:, None], mode="full", axes=0)
+    return fftconvolve(samples, impulse_response, mode="full")
+
+
+def airport_pa_effect(samples, fs, low_freq=150, high_freq=4000, impulse_response=None, noise_dbfs=-55):
+    """Terminal PA: wider band-pass, convolution reverb and background noise."""
+    if impulse_response is None:
+        impulse_response = echo_impulse_response(fs)
+    filtered = bandpass(samples, low_freq, high_freq, fs)
+    return add_noise(convolution_reverb(filtered, impulse_response), fs, noise_dbfs)
+
+
+class StreamingFilter:
+    """Second-order-section filter that keeps its state between chunks."""
+
+    def __init__(self, sos, channels=1):
+        self.sos = sos
+        shape = (sos.shape[0], 2) if channels == 1 else (sos.shape[0], 2, channels)
+        self.zi = np.zeros(shape)
+
+    def process(self, chunk):
+        output, self.zi = sosfilt(self.sos, chunk, axis=0, zi=self.zi)
+        return output
+
+
+class StreamingPaEffect:
+    """Chunk-by-chunk version of pa_system_effect for mono PCM streams."""
+
+    def __init__(self, fs, low_freq=300, high_freq=3000, noise_dbfs=-50):
+        self.fs = fs
+        self.noise_dbfs = noise_dbfs
+        self.filter = StreamingFilter(bandpass_sos(low_freq, high_freq, fs))
+        self.position = 0
+
+    def process(self, chunk):
+        output = add_noise(self.filter.process(chunk), self.fs, self.noise_dbfs, offset=self.position)
+        self.position += len(chunk)
+        return output
+
+
+class StreamingResampler:
+    """Chunk-by-chunk version of resample (the same polyphase filter as resample_poly).
+
+    The last input samples are kept between chunks, so the output matches
+    resampling the whole signal at once instead of clicking at every chunk
+    boundary. ``flush`` returns the samples still held back at the end.
+    """
+
+    def __init__(self, fs_from, fs_to):
+        divisor = math.gcd(int(fs_from), int(fs_to))
+        self.up = int(fs_to) // divisor
+        self.down = int(fs_from) // divisor
+        max_rate = max(self.up, self.down)
+        self.half_len = 10 * max_rate
+        taps = firwin(2 * self.half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * self.up
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.taps_per_phase * self.up)
+        padded[:len(taps)] = taps
+        # phases[p, j] = taps[p + j * up]
+        self.phases = padded.reshape(self.taps_per_phase, self.up).T
+        self._history = None
+        self._offset = -self.taps_per_phase  # index vstupu prvního vzorku v _history
+        self._received = 0
+        self._produced = 0
+
+    def _emit(self, samples, limit):
+        available = self._offset + len(samples)
+        end = min(limit, -(-(available * self.up - self.half_len) // self.down))
+        n = np.arange(self._produced, max(end, self._produced))
+        t = n * self.down + self.half_len
+        indices = (t // self.up)[:, None] - np.arange(self.taps_per_phase)[None, :] - self._offset
+        weights = self.phases[t % self.up]
+        window = samples[indices]
+        output = np.einsum("nj,nj...->n...", weights, window)
+        self._produced += len(n)
+        self._history = samples[-self.taps_per_phase:]
+        self._offset = available - self.taps_per_phase
+        return output
+
+    def process(self, chunk):
+        if self.up == self.down:
+            return chunk
+        if self._history is None:
+            self._history = np.zeros((self.taps_per_phase,) + chunk.shape[1:])
+        self._received += len(chunk)
+        return self._emit(np.concatenate([self._history, chunk]), float("inf"))
+
+    def flush(self):
+        if self.up == self.down or self._history is None:
+            return None
+        total = -(-self._received * self.up // self.down)
+        padding = np.zeros((self.half_len // self.up + self.taps_per_phase + 1,) + self._history.shape[1:])
+        return self._emit(np.concatenate([self._history, padding]), total)
+
+
+def stream_decode(path, fs=44100, channels=1, chunk_seconds=0.5):
+    """Decode any file ffmpeg understands through a pipe, yielding float sample chunks of bounded size."""
+    cmd = [
+        AudioSegment.converter, "-v", "error", "-nostdin", "-i", path,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(fs), "-"
+    ]
+    chunk_bytes = int(fs * chunk_seconds) * 2 * channels
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        pending = b""
+        while True:
+            data = process.stdout.read(chunk_bytes - len(pending))
+            if not data:
+                break
+            pending += data
+            if len(pending) < chunk_bytes:
+                continue
+            yield _pcm_chunk(pending, channels)
+            pending = b""
+        if len(pending) >= 2 * channels:
+            yield _pcm_chunk(pending[:len(pending) - len(pending) % (2 * channels)], channels)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+def _pcm_chunk(data, channels):
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float64)
+    return samples.reshape(-1, channels) if channels > 1 else samples
+
+
+def distant_effect_stream(chunks, fs, cutoffs=(400, 250), gain_db=6):
+    """Muffled "heard from the cabin" effect for mono chunks: cascaded one-pole low-passes and gain, duplicated to stereo."""
+    filters = [StreamingFilter(lowpass_sos(cutoff, fs)) for cutoff in cutoffs]
+    gain = 10 ** (gain_db / 20)
+    for chunk in chunks:
+        for stage in filters:
+            chunk = stage.process(chunk)
+        yield np.repeat((chunk * gain)[:, None], 2, axis=1)
+
+
+def to_pcm_bytes(samples):
+    """Interleaved 16-bit PCM bytes for playback."""
+    return np.clip(np.rint(samples), -INT16_MAX - 1, INT16_MAX).astype(np.int16).tobytes()
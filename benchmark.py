@@ -0,0 +1,279 @@
+"""End-to-end latency benchmark of play_announcement against a local OpenAI stand-in.
+
+Starts a fake OpenAI server (chat completions + speech, configurable latency,
+canned MP3/PCM audio), drives play_announcement for every phase with 1-6
+languages and reports p50/p95 per stage: translate, TTS, decode, effect,
+encode and playback start (request -> first audible sample).
+
+Runs headless without network or audio device:
+
+    python benchmark.py --languages 1-6 --iterations 3 --chat-latency 0.4 --tts-latency 0.3
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Pygame bez zvukového zařízení - musí být nastavené před importem pygame
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+
+BENCH_LANGUAGES = ["english", "german", "french", "spanish", "italian", "czech"]
+STAGES = ("translate", "tts", "tts_first_chunk", "decode", "effect", "encode", "playback_start", "total")
+PCM_RATE = 24000  # stejně jako response_format="pcm" u OpenAI
+STREAM_CHUNK_BYTES = 4800
+
+BATCH_PROMPT_RE = re.compile(r"into each of these languages in a .*? style: (.*?)\.\n.*?\n\n(.*)", re.S)
+SINGLE_PROMPT_RE = re.compile(r"into (\w+) in a .*? style:\n\n(.*)", re.S)
+
+
+def canned_pcm(seconds):
+    """A short 16-bit mono tone standing in for synthesized speech."""
+    t = np.arange(int(PCM_RATE * seconds)) / PCM_RATE
+    envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) * 20)
+    return (np.sin(2 * np.pi * 440 * t) * envelope * 8000).astype(np.int16).tobytes()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.requests += 1
+        if self.path.endswith("/chat/completions"):
+            time.sleep(self.server.delay(self.server.chat_latency))
+            self._chat(body)
+        elif self.path.endswith("/audio/speech"):
+            time.sleep(self.server.delay(self.server.tts_latency))
+            self._speech(body)
+        else:
+            self.send_error(404)
+
+    def _send(self, content_type, payload):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _chat(self, body):
+        prompt = body["messages"][-1]["content"]
+        batch = BATCH_PROMPT_RE.search(prompt)
+        if batch:
+            text = batch.group(2)
+            content = json.dumps({lang.strip(): f"[{lang.strip()}] {text}" for lang in batch.group(1).split(",")})
+        else:
+            single = SINGLE_PROMPT_RE.search(prompt)
+            content = f"[{single.group(1)}] {single.group(2)}" if single else prompt
+        self._send("application/json", json.dumps({
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8"))
+
+    def _speech(self, body):
+        if body.get("response_format") != "pcm":
+            self._send("audio/mpeg", self.server.mp3)
+            return
+        # PCM posíláme po kouscích rychlostí stream_factor x reálný čas, jako skutečné streamované TTS
+        pcm = self.server.pcm
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/pcm")
+        self.send_header("Content-Length", str(len(pcm)))
+        self.end_headers()
+        chunk_seconds = STREAM_CHUNK_BYTES / 2 / PCM_RATE
+        for start in range(0, len(pcm), STREAM_CHUNK_BYTES):
+            self.wfile.write(pcm[start:start + STREAM_CHUNK_BYTES])
+            self.wfile.flush()
+            time.sleep(chunk_seconds / self.server.stream_factor)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Local stand-in for the OpenAI API on 127.0.0.1 (random free port)."""
+
+    daemon_threads = True
+
+    def __init__(self, pcm, mp3, chat_latency=0.4, tts_latency=0.3, jitter=0.2, stream_factor=4.0):
+        super().__init__(("127.0.0.1", 0), FakeOpenAIHandler)
+        self.pcm = pcm
+        self.mp3 = mp3
+        self.chat_latency = chat_latency
+        self.tts_latency = tts_latency
+        self.jitter = jitter
+        self.stream_factor = stream_factor
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def delay(self, latency):
+        return max(0.0, latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+
+def parse_language_counts(value):
+    """"1-6" or "1,3,6" -> [1, ...]"""
+    counts = []
+    for part in value.split(","):
+        if "-" in part:
+            low, high = part.split("-", 1)
+            counts.extend(range(int(low), int(high) + 1))
+        else:
+            counts.append(int(part))
+    if any(count < 1 or count > len(BENCH_LANGUAGES) for count in counts):
+        raise argparse.ArgumentTypeError(f"language counts must be between 1 and {len(BENCH_LANGUAGES)}")
+    return counts
+
+
+def write_config(workdir, server, args):
+    config = {
+        "announcement_generator": "openai",
+        "openai_api_key": "benchmark",
+        "openai_base_url": server.base_url,
+        "openai_max_retries": 0,
+        "primary_language": "english",
+        "secondary_languages": BENCH_LANGUAGES[1:],
+        "airport_announcement_languages": BENCH_LANGUAGES,
+        "captain_style": "professional",
+        "chime_start": "none",
+        "chime_end": "none",
+        "streaming_tts": args.streaming,
+        "batch_translation": args.batch_translation,
+        "telemetry_recording": False,
+        "cache_dir": os.path.join(workdir, "cache"),
+    }
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4)
+
+
+def flight_info(iteration):
+    return {
+        "captain_name": "Jan Novak",
+        "first_officer": "Petra Svobodova",
+        "flight_number": f"BM{100 + iteration}",
+        "origin": "Prague",
+        "destination": "Lisbon",
+        "aircraft": "Boeing 737-800",
+        "airline": "Benchmark Air",
+        "duration": "3 hours",
+        "primary_lang": "english",
+        "gate": "B12",
+        "food_options": "sandwiches and snacks",
+        "beverage_service": "paid",
+    }
+
+
+def run_benchmark(args):
+    import announcement_generator as ag
+    import metrics
+    import telemetry
+    from audio_cache import AudioCache
+    from translation_cache import TranslationCache
+
+    def use_caches(name):
+        # Vždy vlastní cache v pracovním adresáři - falešné překlady a tóny nesmí skončit v SCRIPT_DIR/cache
+        cache_dir = os.path.join(args.workdir, name)
+        ag.audio_cache = AudioCache(os.path.join(cache_dir, "audio"))
+        ag.translation_cache = TranslationCache(os.path.join(cache_dir, "translations.sqlite3"))
+
+    def play_all(langs, iteration):
+        for phase in phases:
+            ag.played_announcements.clear()
+            flight_data = telemetry.TelemetrySnapshot(phase=phase, temperature=21.0, local_time="14:35")
+            with metrics.registry.span("total"):
+                ag.play_announcement(phase, flight_info(iteration), flight_data, langs, langs, [], "professional")
+
+    phases = args.phases or list(ag.ANNOUNCEMENTS)
+    results = {}
+    for count in args.languages:
+        langs = BENCH_LANGUAGES[:count]
+        if args.warm:
+            # Teplá cesta: cache naplníme jedním neměřeným průchodem a všechny iterace ji sdílí
+            use_caches(f"cache_{count}")
+            for iteration in range(args.iterations):
+                play_all(langs, iteration)
+            print(f"  {count} language(s), caches warmed up", file=sys.stderr)
+        metrics.registry.reset()
+        for iteration in range(args.iterations):
+            if not args.warm:
+                # Studená cesta: každá iterace začíná s prázdnými cache
+                use_caches(f"cache_{count}_{iteration}")
+            play_all(langs, iteration)
+            print(f"  {count} language(s), iteration {iteration + 1}/{args.iterations} done", file=sys.stderr)
+        results[count] = metrics.registry.summary()
+    return results, dict(ag.api.stats)
+
+
+def format_report(results):
+    lines = [f"{'langs':>5}  {'stage':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}"]
+    for count, summary in results.items():
+        for stage in STAGES:
+            entry = summary.get(stage)
+            if not entry or not entry["count"]:
+                continue
+            lines.append(f"{count:>5}  {stage:<16}{entry['count']:>7}{entry['p50'] * 1000:>10.1f}{entry['p95'] * 1000:>10.1f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end announcement latency benchmark (headless, offline).")
+    parser.add_argument("--languages", type=parse_language_counts, default=parse_language_counts("1-6"), help="language counts, e.g. 1-6 or 1,3,6")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--phases", type=lambda value: value.split(","), help="comma separated phases (default: all)")
+    parser.add_argument("--chat-latency", type=float, default=0.4, help="seconds before the fake chat completion answers")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="seconds before the fake speech endpoint sends the first byte")
+    parser.add_argument("--jitter", type=float, default=0.2, help="relative random spread of the latencies")
+    parser.add_argument("--stream-factor", type=float, default=4.0, help="how much faster than real time PCM is streamed")
+    parser.add_argument("--clip-seconds", type=float, default=0.5, help="length of the canned speech")
+    parser.add_argument("--no-streaming", dest="streaming", action="store_false", help="disable streaming TTS for the first language")
+    parser.add_argument("--no-batch-translation", dest="batch_translation", action="store_false")
+    parser.add_argument("--warm", action="store_true", help="keep caches between iterations (measures the cached path)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    import audio_effects
+
+    pcm = canned_pcm(args.clip_seconds)
+    mp3 = audio_effects.encode(np.frombuffer(pcm, dtype=np.int16).astype(np.float64), PCM_RATE, format="mp3", bitrate="48k")
+    server = FakeOpenAIServer(pcm, mp3, args.chat_latency, args.tts_latency, args.jitter, args.stream_factor).start()
+
+    # announcement_generator čte config.json z pracovního adresáře, benchmark má vlastní
+    args.workdir = tempfile.mkdtemp(prefix="any_airline_bench_")
+    previous_cwd = os.getcwd()
+    try:
+        write_config(args.workdir, server, args)
+        os.chdir(args.workdir)
+        started = time.time()
+        results, api_stats = run_benchmark(args)
+    finally:
+        os.chdir(previous_cwd)
+        server.shutdown()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    print(format_report(results))
+    print(f"\n{server.requests} fake API requests, client stats: {api_stats}, {time.time() - started:.0f}s total")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "api_stats": api_stats}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
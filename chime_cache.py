@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+import audio_effects
+
+logger = logging.getLogger(__name__)
+
+CHIME_DIR = os.path.join(audio_effects.SCRIPT_DIR, "airport_chimes")
+CHIME_CACHE_DIR = os.path.join(audio_effects.SCRIPT_DIR, "cache", "chimes")
+# Kolik zpracovaných chimů držíme na disku (nejdéle nepoužité se mažou)
+MAX_CACHED_FILES = 64
+
+
+class ChimeCache:
+    """Decoded, attenuated (and optionally effected) chimes as ready PCM buffers.
+
+    Entries are keyed by (file, mtime, size, sample rate, processing parameters,
+    impulse response file), so editing or replacing a chime or the reverb
+    invalidates it automatically. Buffers are kept in memory and as .npy files
+    on disk for the next start; only the ``max_files`` most recently used
+    files are kept.
+    """
+
+    def __init__(self, chime_dir=CHIME_DIR, cache_dir=CHIME_CACHE_DIR, max_files=MAX_CACHED_FILES):
+        self.chime_dir = chime_dir
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _file_key(path):
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {"file": os.path.abspath(path), "missing": True}
+        return {"file": os.path.abspath(path), "mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+    def _key(self, path, fs, attenuation_db, effect, ir_path=None):
+        payload = json.dumps({
+            **self._file_key(path),
+            "fs": fs,
+            "attenuation_db": attenuation_db,
+            "effect": effect,
+            "impulse_response": self._file_key(ir_path),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, chime_name, fs, attenuation_db=-5, effect=None, impulse_response=None):
+        """Return mono float samples of the chime at ``fs`` or None if it does not exist.
+
+        ``effect`` is None for the dry chime or "airport" for the terminal PA preview,
+        which uses the ``impulse_response`` file (airport_reverb_ir) like the live announcement.
+        """
+        if not chime_name or chime_name == "none":
+            return None
+        path = os.path.join(self.chime_dir, chime_name)
+        if not os.path.exists(path):
+            logger.warning(f"Chime {path} does not exist!")
+            return None
+        ir_path = audio_effects.impulse_response_file(impulse_response) if effect == "airport" else None
+        key = self._key(path, fs, attenuation_db, effect, ir_path)
+        with self._lock:
+            samples = self._memory.get(key)
+            if samples is not None:
+                return samples
+            cache_file = os.path.join(self.cache_dir, f"{key}.npy")
+            if os.path.exists(cache_file):
+                try:
+                    samples = np.load(cache_file)
+                    os.utime(cache_file)
+                except Exception as e:
+                    logger.warning(f"Corrupt chime cache {cache_file}: {e}")
+            if samples is None:
+                logger.info(f"Processing chime {chime_name} ({fs} Hz, {attenuation_db} dB, effect: {effect})")
+                samples = self._process(path, fs, attenuation_db, effect, ir_path)
+                np.save(cache_file, samples)
+                self._prune()
+            samples.setflags(write=False)
+            self._memory[key] = samples
+            return samples
+
+    def _prune(self):
+        try:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".npy")]
+            paths.sort(key=os.path.getmtime)
+        except OSError:
+            return
+        for path in paths[:max(0, len(paths) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove cached chime {path}: {e}")
+
+    @staticmethod
+    def _process(path, fs, attenuation_db, effect, ir_path=None):
+        samples, chime_fs = audio_effects.decode(path)
+        samples = audio_effects.gain(audio_effects.resample(audio_effects.to_mono(samples), chime_fs, fs), attenuation_db)
+        if effect == "airport":
+            impulse_response = None
+            if ir_path:
+                try:
+                    impulse_response = audio_effects.load_impulse_response(ir_path, fs)
+                except Exception as e:
+                    logger.error(f"Failed to load impulse response {ir_path}: {e}. Using default echoes.")
+            samples = audio_effects.airport_pa_effect(samples, fs, impulse_response=impulse_response)
+        elif effect is not None:
+            raise ValueError(f"Unknown chime effect: {effect}")
+        return samples.astype(np.float32)
+
+
+chimes = ChimeCache()
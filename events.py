@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Kolik posledních událostí si hub pamatuje (pro pomalé a znovu připojené odběratele)
+RING_CAPACITY = 512
+HEARTBEAT_SECONDS = 15
+# Typy událostí, u kterých odběrateli stačí ta nejnovější
+COALESCED_TYPES = {"telemetry"}
+
+
+class EventHub:
+    """Broadcast of live status events to any number of viewers.
+
+    ``publish`` serializes an event once and appends it to a ring buffer;
+    viewers never get their own queue or polling thread. Each one keeps only
+    a cursor (the last event id) and blocks on a shared Condition until
+    newer events exist. A viewer that falls behind the ring skips the
+    events it missed, and of several queued telemetry events it only gets
+    the newest. ``latest`` keeps the last payload of every event type (per
+    ``key`` when one is given, e.g. per announcement) for the /status
+    snapshot.
+    """
+
+    def __init__(self, capacity=RING_CAPACITY):
+        self._events = deque(maxlen=capacity)
+        self._next_id = 1
+        self._cond = threading.Condition()
+        self.latest = {}
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+    def publish(self, event_type, data, key=None):
+        payload = json.dumps(data, default=str)
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, event_type, payload))
+            if key is None:
+                self.latest[event_type] = data
+            else:
+                self.latest.setdefault(event_type, {})[key] = data
+            self._cond.notify_all()
+        return event_id
+
+    def state(self):
+        """Copy of ``latest`` and the id of the newest event."""
+        with self._cond:
+            latest = {key: dict(value) if isinstance(value, dict) else value for key, value in self.latest.items()}
+            return latest, self.last_id
+
+    def wait(self, last_id, timeout=None):
+        """Events newer than ``last_id`` (blocking up to ``timeout``); an empty list on timeout."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._next_id - 1 > last_id, timeout)
+            events = [event for event in self._events if event[0] > last_id]
+        newest = {}
+        for event_id, event_type, _ in events:
+            if event_type in COALESCED_TYPES:
+                newest[event_type] = event_id
+        return [event for event in events if event[1] not in COALESCED_TYPES or newest[event[1]] == event[0]]
+
+    def stream(self, last_id=None, heartbeat=HEARTBEAT_SECONDS):
+        """Generator of Server-Sent Events text, starting after ``last_id`` (default: only new events)."""
+        if last_id is None:
+            last_id = self.last_id
+        yield "retry: 2000\n\n"
+        while True:
+            events = self.wait(last_id, timeout=heartbeat)
+            if not events:
+                yield f": keepalive {time.time():.0f}\n\n"
+                continue
+            for event_id, event_type, payload in events:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+            last_id = events[-1][0]
+
+
+hub = EventHub()
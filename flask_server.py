@@ -2,33 +2,46 @@ import threading
 import tkinter as tk
 import time
 import os
+import sys
 import json
-from flask import Flask, request, jsonify, render_template, redirect, url_for
+import traceback
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for
 import threading
-from announcement_generator import play_announcement, play_safety_announcement, find_safety_videos
+from announcement_generator import SCRIPT_DIR, play_announcement, play_safety_announcement, find_safety_videos
+from flight_data_watcher import FileWatcher, read_flight_data_file
+import events
+import metrics
+import scratch
+import telemetry
+import telemetry_recorder
+import udp_telemetry
 
 CONFIG_FILE = "config.json"
+RECORDINGS_DIR = os.path.join(SCRIPT_DIR, "recordings")
 
 # Globální proměnné pro stav letu
 flight_info = None
 flight_phase = None
-flight_data = {
-    "phase": "Unknown",
-    "altitude": 0,
-    "speed": 0,
-    "vertical_speed": 0,
-    "beacon": 0,
-    "strobe": 0,
-    "taxi_light": 0,
-    "landing_light": 0,
-    "temperature": 20.0,
-    "local_time": "12:00"
-}
+# Ruční průchod fázemi (run_flight) čeká na tlačítko Next Phase místo dotazování
+flight_phase_changed = threading.Condition()
+# Telemetrie ze simulátoru - verzované neměnné snímky, čtenáři si berou snapshot() nebo čekají na změnu
+telemetry_store = telemetry.TelemetryStore()
+# Každá nová verze telemetrie jde i do živého přenosu (/events, /status)
+telemetry_store.subscribe(lambda old, new: events.hub.publish("telemetry", {"version": new.version, **new}))
 
 last_logged_phase = None
 last_log_time = time.time()
 FLIGHT_DATA_FILE = None
 
+# Záznam telemetrie letu a případné přehrávání dříve nahraného letu místo simulátoru
+telemetry_recording = None
+telemetry_replay = None
+replay_speed = 1.0
+
+# Čas posledního vzorku přes UDP - dokud chodí, soubor se jen sleduje jako záloha
+last_udp_sample = None
+UDP_FRESH_SECONDS = 2
+
 # Fáze letu
 FLIGHT_PHASES = [
     "AirportBoarding", "Gate", "Pushback", "Takeoff", "Climb", "Cruise",
@@ -42,108 +55,139 @@ def load_config():
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def load_language_settings(config=None):
+    """Načte jazyky hlášení v pořadí podle all_language_order / airport_announcement_order."""
+    if config is None:
+        config = load_config()
+    all_order = config.get("all_language_order", [])
+    all_langs = list(dict.fromkeys([config["primary_language"]] + config["secondary_languages"]))
+    all_langs_sorted = [lang for lang, _ in sorted(all_order, key=lambda x: x[1])] if all_order else all_langs
+    airport_langs = config["airport_announcement_languages"]
+    airport_order = config.get("airport_announcement_order", [])
+    airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
+    captain_style = config.get("captain_style", "professional")
+    return all_langs_sorted, airport_langs_sorted, airport_order, captain_style
+
 def update_flight_data_path():
     """Načte cestu k flight_data.txt z config.json."""
     global FLIGHT_DATA_FILE
     config = load_config()
     file_path = config.get("flight_data_file", "").strip()
 
-    if file_path and os.path.exists(file_path):
+    if file_path:
+        # Cestu sledujeme i když soubor ještě neexistuje - watcher si všimne jeho vytvoření
         FLIGHT_DATA_FILE = file_path
-        print(f"✅ Flight data file found: {FLIGHT_DATA_FILE}")
+        if os.path.exists(file_path):
+            print(f"✅ Flight data file found: {FLIGHT_DATA_FILE}")
+        else:
+            print(f"⚠️ Flight data file {FLIGHT_DATA_FILE} does not exist yet, waiting for data...")
     else:
         print("⚠️ Flight data file is not set or invalid in config.json!")
 
 update_flight_data_path()
 
+def log_flight_data():
+    """📡 Logování pouze při změně fáze nebo každých 5 sekund."""
+    global last_logged_phase, last_log_time
+    current_time = time.time()
+    flight_data = telemetry_store.snapshot()
+    if flight_data.phase != last_logged_phase or (current_time - last_log_time) >= 5:
+        print(f"📡 Flight phase updated: {flight_data.phase} (Altitude: {flight_data.altitude} ft, Speed: {flight_data.speed} knots)")
+        last_logged_phase = flight_data.phase
+        last_log_time = current_time
+
 def read_flight_data():
-    """Čte data z flight_data.txt každou sekundu."""
-    global flight_data, last_logged_phase, last_log_time
+    """Sleduje flight_data.txt (inotify, jinak kontrola mtime) a načte ho jen po změně."""
+    poll_interval = load_config().get("flight_data_poll_ms", 50) / 1000
+    watcher = None
+    missing_reported = False
 
     while True:
-        if FLIGHT_DATA_FILE and os.path.exists(FLIGHT_DATA_FILE):
+        if not FLIGHT_DATA_FILE:
+            time.sleep(1)
+            continue
+        if watcher is None or watcher.path != FLIGHT_DATA_FILE:
+            if watcher is not None:
+                watcher.close()
+            watcher = FileWatcher(FLIGHT_DATA_FILE, poll_interval=poll_interval)
+            print(f"👀 Watching {FLIGHT_DATA_FILE} ({watcher.mode})")
+
+        if os.path.exists(FLIGHT_DATA_FILE):
+            missing_reported = False
             try:
-                with open(FLIGHT_DATA_FILE, "r") as f:
-                    lines = f.readlines()
-                
-                new_data = {}
-                for line in lines:
-                    line = line.strip()
-                    if "=" in line:
-                        key, value = line.split("=", 1)
-                        key = key.strip()
-                        value = value.strip()
-
-                        if key in flight_data:
-                            if key in ["phase"]:
-                                new_data[key] = value
-                            elif key == "local_time":
-                                # Formátování local_time na HH:MM
-                                if ":" in value:
-                                    value = value[:5]  # Vezmeme pouze první 5 znaků (HH:MM)
-                                new_data[key] = value
-                            else:
-                                try:
-                                    new_data[key] = float(value)
-                                except ValueError:
-                                    print(f"⚠️ Invalid value for {key}: {value}")
-
-                # Pokud soubor obsahuje platná data, aktualizujeme flight_data
-                if new_data:
-                    flight_data.update(new_data)
-
+                # None = rozepsaný soubor, počkáme na další změnu
+                new_data = read_flight_data_file(FLIGHT_DATA_FILE, telemetry.FIELDS)
+                if new_data and not udp_is_fresh():
+                    telemetry_store.update(new_data)
             except Exception as e:
                 print(f"❌ Error reading flight_data.txt: {e}")
-
-        else:
+        elif not missing_reported:
             print("⚠️ flight_data.txt file does not exist, waiting for data...")
+            missing_reported = True
 
-        # 📡 Logování pouze při změně fáze nebo každých 5 sekund
-        current_time = time.time()
-        if flight_data["phase"] != last_logged_phase or (current_time - last_log_time) >= 5:
-            print(f"📡 Flight phase updated: {flight_data['phase']} (Altitude: {flight_data['altitude']} ft, Speed: {flight_data['speed']} knots)")
-            last_logged_phase = flight_data["phase"]
-            last_log_time = current_time
+        log_flight_data()
+        watcher.wait(timeout=5)
 
-        time.sleep(1)
+def udp_is_fresh():
+    return last_udp_sample is not None and time.monotonic() - last_udp_sample < UDP_FRESH_SECONDS
 
-def run_flight():
-    global flight_phase
+def apply_udp_sample(sample):
+    """Zapíše vzorek z UDP do telemetrie."""
+    global last_udp_sample
+    if not udp_is_fresh():
+        print("📶 Receiving flight data over UDP")
+    last_udp_sample = time.monotonic()
+    telemetry_store.update(sample)
+    log_flight_data()
+
+def start_udp_listener():
+    """Spustí UDP přijímač telemetrie z FlyWithLua (pokud není vypnutý v config.json)."""
     config = load_config()
-    all_langs_sorted = list(set([config["primary_language"]] + config["secondary_languages"]))
-    airport_langs = config["airport_announcement_languages"]
-    airport_order = config.get("airport_announcement_order", [])
-    airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
-    captain_style = config.get("captain_style", "professional")
+    if not config.get("telemetry_udp", True):
+        return None
+    try:
+        return udp_telemetry.UdpTelemetryListener(
+            apply_udp_sample,
+            host=config.get("telemetry_udp_host", udp_telemetry.DEFAULT_HOST),
+            port=int(config.get("telemetry_udp_port", udp_telemetry.DEFAULT_PORT))
+        ).start()
+    except OSError as e:
+        print(f"⚠️ UDP telemetry listener could not start ({e}), using flight_data.txt only")
+        return None
+
+def set_flight_phase(phase):
+    global flight_phase
+    with flight_phase_changed:
+        flight_phase = phase
+        flight_phase_changed.notify_all()
+
+def wait_while_phase(phase, timeout=None):
+    """Block until the manual flight leaves ``phase`` (or the timeout passes)."""
+    with flight_phase_changed:
+        flight_phase_changed.wait_for(lambda: flight_phase != phase, timeout)
+
+def run_flight():
+    all_langs_sorted, airport_langs_sorted, airport_order, captain_style = load_language_settings()
 
     for phase in FLIGHT_PHASES:
-        flight_phase = phase
-        if phase == "AirportBoarding":
-            play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
-        elif phase == "Gate":
-            play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
-            # Čekání na další akci (např. Last Call nebo Next Phase)
-            while flight_phase == "Gate":
-                time.sleep(1)
-        elif phase == "Cruise":
-            play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
-            # Čekání na další akci (např. Inflight Service nebo Next Phase)
-            while flight_phase == "Cruise":
-                time.sleep(1)
+        set_flight_phase(phase)
+        play_announcement(phase, flight_info, telemetry_store.snapshot(), all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
+        if phase in ("Gate", "Cruise"):
+            # Čekání na další akci (Last Call / Inflight Service nebo Next Phase)
+            wait_while_phase(phase)
         else:
-            play_announcement(phase, flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
-        time.sleep(5)  # Simulace času mezi fázemi
+            wait_while_phase(phase, timeout=5)  # Simulace času mezi fázemi, Next Phase ji zkrátí
 
 app = Flask(__name__)
 
 @app.route('/')
 def index():
-    safety_videos = find_safety_videos("icao_code")  # Nahradit skutečným ICAO kódem
+    safety_videos = find_safety_videos(flight_info.get("airline_icao"), flight_info.get("aircraft")) if flight_info else []
     return render_template('index.html', flight_phase=flight_phase, flight_info=flight_info, safety_videos=safety_videos)
 
 @app.route('/start_flight', methods=['POST'])
 def start_flight():
-    global flight_info, flight_phase
+    global flight_info
     flight_info = {
         "flight_number": request.form['flight_number'],
         "origin": request.form['origin'],
@@ -156,46 +200,84 @@ def start_flight():
         "food_options": request.form['food_options'],  # Možnosti jídla
         "beverage_service": request.form['beverage_service'],  # Typ nápojové služby
     }
-    flight_phase = None
+    set_flight_phase(None)
     # Spustíme let v samostatném vlákně
     threading.Thread(target=run_flight, daemon=True).start()
     return redirect(url_for('index'))
 
 @app.route('/next_phase', methods=['POST'])
 def next_phase():
-    global flight_phase
     if flight_phase in FLIGHT_PHASES:
         current_index = FLIGHT_PHASES.index(flight_phase)
         if current_index < len(FLIGHT_PHASES) - 1:
-            flight_phase = FLIGHT_PHASES[current_index + 1]
+            set_flight_phase(FLIGHT_PHASES[current_index + 1])
     return redirect(url_for('index'))
 
 @app.route('/last_call', methods=['POST'])
 def last_call():
-    config = load_config()
-    all_langs_sorted = list(set([config["primary_language"]] + config["secondary_languages"]))
-    airport_langs = config["airport_announcement_languages"]
-    airport_order = config.get("airport_announcement_order", [])
-    airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
-    captain_style = config.get("captain_style", "professional")
+    all_langs_sorted, airport_langs_sorted, airport_order, captain_style = load_language_settings()
 
     if flight_phase == "Gate":
-        play_announcement("LastCall", flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
+        play_announcement("LastCall", flight_info, telemetry_store.snapshot(), all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
     return redirect(url_for('index'))
 
 @app.route('/meal_service', methods=['POST'])
 def meal_service():
-    config = load_config()
-    all_langs_sorted = list(set([config["primary_language"]] + config["secondary_languages"]))
-    airport_langs = config["airport_announcement_languages"]
-    airport_order = config.get("airport_announcement_order", [])
-    airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
-    captain_style = config.get("captain_style", "professional")
+    all_langs_sorted, airport_langs_sorted, airport_order, captain_style = load_language_settings()
 
     if flight_phase == "Cruise":
-        play_announcement("InflightService", flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
+        play_announcement("InflightService", flight_info, telemetry_store.snapshot(), all_langs_sorted, airport_langs_sorted, airport_order, captain_style)
     return redirect(url_for('index'))
 
+@app.route('/status')
+def status():
+    """Aktuální stav letu jako JSON - levná alternativa k obnovování celé stránky."""
+    latest, last_event_id = events.hub.state()
+    snapshot = telemetry_store.snapshot()
+    return jsonify({
+        "telemetry": {"version": snapshot.version, **snapshot},
+        "phase": latest.get("phase"),
+        "announcements": latest.get("announcement", {}),
+        "manual_phase": flight_phase,
+        "flight": {key: flight_info.get(key) for key in ("flight_number", "origin", "destination", "airline", "gate")} if flight_info else None,
+        "last_event_id": last_event_id,
+    })
+
+@app.route('/events')
+def event_stream():
+    """Server-Sent Events s telemetrií, změnami fáze a průběhem hlášení (queued, rendering, playing...)."""
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    return Response(
+        events.hub.stream(int(last_id) if last_id and last_id.isdigit() else None),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Časy jednotlivých fází renderu, počty volání API, cache a fronty v Prometheus formátu."""
+    return Response(metrics.registry.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/debug/threads')
+def debug_threads():
+    """Všechna vlákna s místem, kde právě jsou, a délky pracovních front."""
+    frames = sys._current_frames()
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        stack = traceback.extract_stack(frame)[-3:] if frame else []
+        threads.append({
+            "name": thread.name,
+            "daemon": thread.daemon,
+            "alive": thread.is_alive(),
+            "stack": [f"{os.path.basename(entry.filename)}:{entry.lineno} in {entry.name}" for entry in stack],
+        })
+    return jsonify({
+        "threads": sorted(threads, key=lambda thread: thread["name"]),
+        "queues": metrics.registry.queue_depths(),
+        "scratch": scratch.arena.stats(),
+    })
+
 def start_gui():
     """Spustí GUI pro sledování letových fází."""
     root = tk.Tk()
@@ -218,35 +300,25 @@ def start_gui():
 
     # Funkce pro spuštění Last Call
     def trigger_last_call():
-        if flight_data['phase'] == "Gate":
-            config = load_config()
-            all_langs_sorted = list(set([config["primary_language"]] + config["secondary_languages"]))
-            airport_langs = config["airport_announcement_languages"]
-            airport_order = config.get("airport_announcement_order", [])
-            airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
-            captain_style = config.get("captain_style", "professional")
+        if telemetry_store.snapshot().phase == "Gate":
+            all_langs_sorted, airport_langs_sorted, airport_order, captain_style = load_language_settings()
 
             # Spustíme play_announcement na samostatném vlákně
             threading.Thread(
                 target=play_announcement,
-                args=("LastCall", flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style),
+                args=("LastCall", flight_info, telemetry_store.snapshot(), all_langs_sorted, airport_langs_sorted, airport_order, captain_style),
                 daemon=True
             ).start()
 
     # Funkce pro spuštění Inflight Service
     def trigger_meal_service():
-        if flight_data['phase'] == "Cruise":
-            config = load_config()
-            all_langs_sorted = list(set([config["primary_language"]] + config["secondary_languages"]))
-            airport_langs = config["airport_announcement_languages"]
-            airport_order = config.get("airport_announcement_order", [])
-            airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
-            captain_style = config.get("captain_style", "professional")
+        if telemetry_store.snapshot().phase == "Cruise":
+            all_langs_sorted, airport_langs_sorted, airport_order, captain_style = load_language_settings()
             
             # Spustíme play_announcement na samostatném vlákně
             threading.Thread(
                 target=play_announcement,
-                args=("InflightService", flight_info, flight_data, all_langs_sorted, airport_langs_sorted, airport_order, captain_style),
+                args=("InflightService", flight_info, telemetry_store.snapshot(), all_langs_sorted, airport_langs_sorted, airport_order, captain_style),
                 daemon=True
             ).start()
 
@@ -258,35 +330,69 @@ def start_gui():
     meal_service_button = tk.Button(root, text="Inflight Service", font=("Arial", 12), command=trigger_meal_service)
     meal_service_button.pack(pady=5)
 
-    def update_ui():
-        """Pravidelně aktualizuje data v GUI."""
-        phase_label.config(text=f"Flight Phase: {flight_data['phase']}")
-        altitude_label.config(text=f"Altitude: {flight_data['altitude']} ft")
-        speed_label.config(text=f"Speed: {flight_data['speed']} knots")
-        vs_label.config(text=f"Vertical Speed: {flight_data['vertical_speed']} ft/min")
-        lights_label.config(
-            text=f"Lights: Beacon({flight_data['beacon']}) Strobe({flight_data['strobe']}) "
-                 f"Taxi({flight_data['taxi_light']}) Landing({flight_data['landing_light']})"
-        )
-        # Aktivace/deaktivace tlačítek podle fáze letu
-        if flight_data['phase'] == "Gate":
-            last_call_button.config(state="normal")
-        else:
-            last_call_button.config(state="disabled")
+    shown_version = None
 
-        if flight_data['phase'] == "Cruise":
-            meal_service_button.config(state="normal")
-        else:
-            meal_service_button.config(state="disabled")
-
-        root.after(1000, update_ui)
+    def update_ui():
+        """Překreslí GUI, jen když přišla nová verze telemetrie (Tk se musí obsluhovat z vlastního vlákna)."""
+        nonlocal shown_version
+        flight_data = telemetry_store.snapshot()
+        if flight_data.version != shown_version:
+            shown_version = flight_data.version
+            phase_label.config(text=f"Flight Phase: {flight_data.phase}")
+            altitude_label.config(text=f"Altitude: {flight_data.altitude} ft")
+            speed_label.config(text=f"Speed: {flight_data.speed} knots")
+            vs_label.config(text=f"Vertical Speed: {flight_data.vertical_speed} ft/min")
+            lights_label.config(
+                text=f"Lights: Beacon({flight_data.beacon}) Strobe({flight_data.strobe}) "
+                     f"Taxi({flight_data.taxi_light}) Landing({flight_data.landing_light})"
+            )
+            # Aktivace/deaktivace tlačítek podle fáze letu
+            last_call_button.config(state="normal" if flight_data.phase == "Gate" else "disabled")
+            meal_service_button.config(state="normal" if flight_data.phase == "Cruise" else "disabled")
+
+        root.after(100, update_ui)
 
     update_ui()
     root.mainloop()
 
-# 🏃‍♂️ Spustíme čtení souboru v samostatném vlákně
-data_thread = threading.Thread(target=read_flight_data, daemon=True)
-data_thread.start()
+def start_telemetry_recording():
+    """Nahrává každý vzorek telemetrie do recordings/ (jen když je zapnuté "telemetry_recording" v config.json)."""
+    config = load_config()
+    if not config.get("telemetry_recording", False):
+        return None
+    path = os.path.join(RECORDINGS_DIR, time.strftime("%Y%m%d_%H%M%S") + telemetry_recorder.RECORDING_SUFFIX)
+    try:
+        # Necháme jen posledních N záznamů (včetně toho nového)
+        telemetry_recorder.prune_recordings(RECORDINGS_DIR, int(config.get("telemetry_recordings_keep", 20)) - 1)
+        return telemetry_recorder.TelemetryRecorder(telemetry_store, path).start()
+    except OSError as e:
+        print(f"⚠️ Telemetry recording could not start: {e}")
+        return None
+
+def start_telemetry_replay():
+    """Přehraje nahraný let z config.json ("telemetry_replay") rychlostí "telemetry_replay_speed"."""
+    global replay_speed
+    config = load_config()
+    path = config.get("telemetry_replay")
+    if not path:
+        return None
+    try:
+        speed = float(config.get("telemetry_replay_speed", 1))
+        replay = telemetry_recorder.TelemetryReplay(telemetry_recorder.load_recording(path), telemetry_store, speed=speed)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Telemetry replay of {path} failed ({e}), using live X-Plane data")
+        return None
+    replay_speed = speed
+    print(f"⏯ Replaying {os.path.basename(path)} at {replay_speed:g}x instead of live X-Plane data")
+    return replay.start()
+
+# 🏃‍♂️ Spustíme čtení souboru v samostatném vlákně, UDP přijímač běží vedle něj (při přehrávání záznamu ani jedno)
+telemetry_replay = start_telemetry_replay()
+if telemetry_replay is None:
+    data_thread = threading.Thread(target=read_flight_data, daemon=True)
+    data_thread.start()
+    udp_listener = start_udp_listener()
+    telemetry_recording = start_telemetry_recording()
 
 def start_flask_server():
     """Spustí Flask server."""
@@ -0,0 +1,161 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Klíče, které flight_data_sender.lua zapisuje v každém vzorku
+REQUIRED_KEYS = ("phase", "altitude", "speed", "vertical_speed", "beacon", "strobe", "taxi_light", "landing_light", "temperature")
+
+# inotify konstanty z <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class TornWrite(ValueError):
+    """The file was read while the writer was still in the middle of rewriting it."""
+
+
+def parse_flight_data(content, known_keys):
+    """Parse ``key=value`` lines into typed values.
+
+    Raises TornWrite when the content is incomplete: missing final newline,
+    a required key absent or a numeric value that does not parse.
+    """
+    if not content.endswith("\n"):
+        raise TornWrite("missing trailing newline")
+    data = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key, value = key.strip(), value.strip()
+        if key not in known_keys:
+            continue
+        if key == "phase":
+            data[key] = value
+        elif key == "local_time":
+            # Formátování local_time na HH:MM
+            data[key] = value[:5] if ":" in value else value
+        else:
+            try:
+                data[key] = float(value)
+            except ValueError:
+                raise TornWrite(f"invalid value for {key}: {value!r}")
+    missing = [key for key in REQUIRED_KEYS if key in known_keys and key not in data]
+    if missing:
+        raise TornWrite(f"missing keys: {', '.join(missing)}")
+    return data
+
+
+def read_flight_data_file(path, known_keys, retries=5, retry_delay=0.01):
+    """Read and parse the file, retrying briefly while a write is in progress; None if it never settles."""
+    for attempt in range(retries):
+        try:
+            before = os.stat(path)
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            after = os.stat(path)
+            if (before.st_mtime_ns, before.st_size) != (after.st_mtime_ns, after.st_size):
+                raise TornWrite("file changed while reading")
+            return parse_flight_data(content, known_keys)
+        except TornWrite as e:
+            last_error = e
+        except FileNotFoundError:
+            return None
+        time.sleep(retry_delay)
+    logger.debug(f"Skipping partial write of {path}: {last_error}")
+    return None
+
+
+class _InotifyWatch:
+    """Watches the file's directory, so replacing or recreating the file is noticed too."""
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.name = os.fsencode(os.path.basename(path))
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(os.path.dirname(os.path.abspath(path))), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return False
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                changed = changed or name == self.name
+                offset += EVENT_HEADER.size + length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Blocks until a file changes: inotify on Linux, stat polling (mtime, size, inode) elsewhere."""
+
+    def __init__(self, path, poll_interval=0.05, use_inotify=True):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._inotify = None
+        self._signature = self._stat()
+        if use_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _InotifyWatch(path)
+            except Exception as e:
+                logger.info(f"inotify is not available ({e}), polling {path} every {poll_interval * 1000:.0f} ms")
+        self.mode = "inotify" if self._inotify else "poll"
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+        except OSError:
+            return None
+
+    def wait(self, timeout=None):
+        """Return True once the file changed (or appeared/disappeared), False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if self._inotify:
+                if self._inotify.wait(remaining):
+                    self._signature = self._stat()
+                    return True
+            else:
+                signature = self._stat()
+                if signature != self._signature:
+                    self._signature = signature
+                    return True
+                time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
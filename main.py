@@ -1,3 +1,9 @@
+import sys
+if "--offline-tts-worker" in sys.argv:
+    # Zabalená aplikace spouští offline TTS worker sama sebou
+    import offline_tts
+    offline_tts.worker_main()
+    sys.exit(0)
 print("Please wait, program is starting...")
 import threading
 print("10%")
@@ -13,15 +19,18 @@ import json
 print("60%")
 import os
 print("70%")
-import pygame
 print("80%")
 from pydub import AudioSegment
+import chime_cache
+import phase_machine
+import playback
 print("90%")
 print("100%")
 import sys
 
 BASE_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(__file__)
 CONFIG_FILE = "config.json"
+CHIME_PREVIEW_RATE = 24000
 
 # Dočasná proměnná pro uložení cesty k flight_data.txt
 pending_flight_data_path = None
@@ -229,11 +238,9 @@ def open_settings_window():
             messagebox.showwarning("Error", f"Chime file {chime_file} not found!")
             return
         try:
-            pygame.mixer.init()
-            pygame.mixer.music.load(chime_path)
-            pygame.mixer.music.play()
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
+            # Náhled zní stejně jako na letišti (ztlumený chime s letištním PA efektem)
+            samples = chime_cache.chimes.get(chime_file, CHIME_PREVIEW_RATE, effect="airport", impulse_response=config.get("airport_reverb_ir", ""))
+            playback.play([(samples, CHIME_PREVIEW_RATE)], playback.PRIORITY_BACKGROUND, name=f"chime {chime_file}")
         except Exception as e:
             messagebox.showwarning("Error", f"Failed to play chime: {str(e)}\nMake sure ffmpeg is installed!")
 
@@ -417,7 +424,7 @@ selected_flight = flight_selection.run_gui()
 
 if selected_flight:
     airline_icao = selected_flight.get("airline_icao") or selected_flight.get("icao") or "Unknown"
-    safety_videos = announcement_generator.find_safety_videos(airline_icao)
+    safety_videos = announcement_generator.find_safety_videos(airline_icao, selected_flight.get("aircraft"))
 
     def confirm_flight():
         global aircraft, airline, flight_duration, safety_announcement_option, selected_safety_video, gate, food_options, beverage_service
@@ -443,7 +450,8 @@ if selected_flight:
             "destination": selected_flight["destination"],
             "aircraft": aircraft,
             "airline": airline,
-            "flight_duration": flight_duration,  # Používáme "flight_duration" pro konzistenci
+            "duration": flight_duration,  # Stejný klíč jako ve flask_server a v šablonách hlášení
+            "airline_icao": airline_icao,
             "primary_lang": primary_lang,
             "gate": gate,
             "food_options": food_options,
@@ -451,6 +459,10 @@ if selected_flight:
         }
         print(f"flight_info set to: {flask_server.flight_info}")  # Ladící výpis
 
+        # 🎬 Zvuk bezpečnostního videa připravíme hned, při Pushbacku pak hraje okamžitě
+        if safety_announcement_option == "video" and selected_safety_video:
+            announcement_generator.safety_video_index.videos.prepare_async(selected_safety_video)
+
         flight_window.destroy()
         flight_confirmed.set(True)
 
@@ -524,135 +536,90 @@ if selected_flight:
 
     print("✅ GUI is running in the background!")
 
-    last_phase = None
-    played_safety_announcement = False
-    safety_announcement_triggered = False
-
     config = load_config()
     primary_lang = config["primary_language"]
-    all_langs = list(set([primary_lang] + config["secondary_languages"]))
-    all_order = config.get("all_language_order", [])
-    all_langs_sorted = [lang for lang, _ in sorted(all_order, key=lambda x: x[1])] if all_order else all_langs
-    airport_langs = config["airport_announcement_languages"]
-    airport_order = config.get("airport_announcement_order", [])
-    airport_langs_sorted = [lang for lang, _ in sorted(airport_order, key=lambda x: x[1])] if airport_order else airport_langs
+    # Stejné pořadí jazyků jako u hlášení spouštěných z webového rozhraní
+    all_langs_sorted, airport_langs_sorted, airport_order, captain_style = flask_server.load_language_settings(config)
     enable_airport = config.get("enable_airport_announcement", True)
-    captain_style = config.get("captain_style", "professional")
-
-    # Main loop
-    while True:
-        phase = flask_server.flight_data["phase"]
-
-        if phase == "Gate":
-            if enable_airport and "AirportBoarding" not in announcement_generator.played_announcements:
-                print("🔔 Generating airport boarding announcement...")
-                announcement_generator.play_announcement(
-                    "AirportBoarding",
-                    {
-                        "flight_number": selected_flight["flight_number"],
-                        "destination": selected_flight["destination"],
-                        "airline": airline,
-                        "primary_lang": primary_lang,
-                        "gate": gate,
-                        "food_options": food_options,
-                        "beverage_service": beverage_service
-                    },
-                    flask_server.flight_data,
-                    all_langs_sorted,
-                    airport_langs_sorted,
-                    airport_order,
-                    captain_style
-                )
-                time.sleep(2)
-
-            if "Gate" not in announcement_generator.played_announcements:
-                print("🗣 Generating captain's Gate announcement...")
-                announcement_generator.play_announcement(
-                    "Gate",
-                    {
-                        "captain_name": captain_name,
-                        "first_officer": first_officer,
-                        "flight_number": selected_flight["flight_number"],
-                        "origin": selected_flight["origin"],
-                        "destination": selected_flight["destination"],
-                        "aircraft": aircraft,
-                        "airline": airline,
-                        "flight_duration": flight_duration,
-                        "primary_lang": primary_lang,
-                        "gate": gate,
-                        "food_options": food_options,
-                        "beverage_service": beverage_service
-                    },
-                    flask_server.flight_data,
-                    all_langs_sorted,
-                    airport_langs_sorted,
-                    airport_order,
-                    captain_style
-                )
-
-        # 🛫 Pushback and safety announcement
-        if phase == "Pushback" and not safety_announcement_triggered:
-            print("🛫 Pushback started! Arm doors and crosscheck")
-            announcement_generator.play_announcement(
-                "Pushback",
-                {
-                    "captain_name": captain_name,
-                    "first_officer": first_officer,
-                    "flight_number": selected_flight["flight_number"],
-                    "origin": selected_flight["origin"],
-                    "destination": selected_flight["destination"],
-                    "aircraft": aircraft,
-                    "airline": airline,
-                    "duration": flight_duration,
-                    "primary_lang": primary_lang,
-                    "gate": gate,
-                    "food_options": food_options,
-                    "beverage_service": beverage_service
-                },
-                flask_server.flight_data,
-                all_langs_sorted,
-                airport_langs_sorted,
-                airport_order,
-                captain_style
-            )
-            time.sleep(5)
+    secondary_langs_sorted = [lang for lang in all_langs_sorted if lang != primary_lang]
+
+    # 🎧 Předem vyrenderujeme hlášení dalších fází, dokud se nastupuje
+    if generator == "free":
+        # Offline TTS worker nastartujeme hned, první hlášení pak nečeká na inicializaci
+        threading.Thread(target=announcement_generator.offline_tts.get_worker().start, daemon=True).start()
+    if generator == "openai":
+        import prerender
+        prerender_scheduler = prerender.PrerenderScheduler(
+            flask_server.flight_info,
+            flask_server.telemetry_store,
+            all_langs_sorted,
+            airport_langs_sorted,
+            captain_style,
+            aircraft=aircraft,
+            safety_langs=[primary_lang] + secondary_langs_sorted if safety_announcement_option == "generated" else None
+        ).start()
+
+    # Main loop: stavový automat fází reaguje na každou změnu telemetrie a hlášení přehrává na vlastním vlákně
+    def announcement_info(phase):
+        if phase == "AirportBoarding":
+            return {
+                "flight_number": selected_flight["flight_number"],
+                "destination": selected_flight["destination"],
+                "airline": airline,
+                "primary_lang": primary_lang,
+                "gate": gate,
+                "food_options": food_options,
+                "beverage_service": beverage_service
+            }
+        return {
+            "captain_name": captain_name,
+            "first_officer": first_officer,
+            "flight_number": selected_flight["flight_number"],
+            "origin": selected_flight["origin"],
+            "destination": selected_flight["destination"],
+            "aircraft": aircraft,
+            "airline": airline,
+            "duration": flight_duration,
+            "primary_lang": primary_lang,
+            "gate": gate,
+            "food_options": food_options,
+            "beverage_service": beverage_service
+        }
 
+    def play_phase_announcement(name, flight_data):
+        if name == "Safety":
             if safety_announcement_option == "video" and os.path.exists(selected_safety_video):
                 print(f"🎬 Playing safety video: {selected_safety_video}")
-                announcement_generator.play_safety_announcement(aircraft, selected_safety_video, primary_lang, secondary_langs)
+                announcement_generator.play_safety_announcement(aircraft, selected_safety_video, primary_lang, secondary_langs_sorted)
             elif safety_announcement_option == "generated":
                 print("🎙️ Generating safety demo...")
-                announcement_generator.play_safety_announcement(aircraft, None, primary_lang, secondary_langs)
+                announcement_generator.play_safety_announcement(aircraft, None, primary_lang, secondary_langs_sorted)
             else:
                 print("⏩ Skipping safety demo.")
-
-            played_safety_announcement = True
-            safety_announcement_triggered = True
-
-        # 🗣 Other announcements (kromě LastCall a InflightService)
-        if phase != last_phase and phase in announcement_generator.ANNOUNCEMENTS and phase not in ["LastCall", "InflightService"]:
-            announcement_generator.play_announcement(
-                phase,
-                {
-                    "captain_name": captain_name,
-                    "first_officer": first_officer,
-                    "flight_number": selected_flight["flight_number"],
-                    "origin": selected_flight["origin"],
-                    "destination": selected_flight["destination"],
-                    "aircraft": aircraft,
-                    "airline": airline,
-                    "duration": flight_duration,
-                    "primary_lang": primary_lang,
-                    "gate": gate,
-                    "food_options": food_options,
-                    "beverage_service": beverage_service
-                },
-                flask_server.flight_data,
-                all_langs_sorted,
-                airport_langs_sorted,
-                airport_order,
-                captain_style
-            )
-            last_phase = phase
-
-        time.sleep(5)
\ No newline at end of file
+            announcement_generator.played_announcements.add("Safety")
+            return
+        if name == "AirportBoarding":
+            print("🔔 Generating airport boarding announcement...")
+        elif name == "Gate":
+            print("🗣 Generating captain's Gate announcement...")
+        elif name == "Pushback":
+            print("🛫 Pushback started! Arm doors and crosscheck")
+        announcement_generator.play_announcement(
+            name,
+            announcement_info(name),
+            flight_data,
+            all_langs_sorted,
+            airport_langs_sorted,
+            airport_order,
+            captain_style
+        )
+
+    machine = phase_machine.PhaseStateMachine(
+        flask_server.telemetry_store,
+        play_phase_announcement,
+        played=announcement_generator.played_announcements,
+        disabled=() if enable_airport else ("AirportBoarding",),
+        debounce_seconds=config.get("phase_debounce_seconds", 1.0),
+        time_scale=flask_server.replay_speed
+    ).start()
+    machine.wait()
\ No newline at end of file
@@ -0,0 +1,179 @@
+import bisect
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Hranice bucketů histogramu v sekundách (od rychlého efektu po celé hlášení)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Kolik posledních měření držíme pro percentily
+RECENT_WINDOW = 2048
+# Prefix všech metrik v Prometheus výstupu
+PREFIX = "any_airline"
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent values for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=RECENT_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (``q`` in 0-100) of a sequence; None when it is empty."""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(1, math.ceil(q / 100 * len(values))) - 1]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Timing spans per pipeline stage (translate, tts, decode, effect, encode, playback_start...).
+
+    ``span(stage, **labels)`` times a block and records it in a histogram
+    keyed by stage and labels; ``observe`` records a duration measured
+    elsewhere. ``summary()`` reports count and p50/p95 per stage.
+
+    Counters are kept with ``inc``. Values owned by other modules (cache
+    hit counts, API stats, queue depths) are not copied here: a collector
+    registered with ``register_collector`` yields them when ``prometheus()``
+    renders the text exposition format for the /metrics route.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self._collectors = []
+        self._queues = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, stage, seconds, **labels):
+        key = self._key(stage, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def register_collector(self, collector):
+        """``collector()`` yields (name, "counter" | "gauge", labels, value) samples at scrape time."""
+        self._collectors.append(collector)
+
+    def register_queue(self, name, depth):
+        """Report ``depth()`` as the length of a work queue in /metrics and /debug/threads."""
+        self._queues[name] = depth
+
+    def queue_depths(self):
+        depths = {}
+        for name, depth in list(self._queues.items()):
+            try:
+                depths[name] = depth()
+            except Exception:
+                depths[name] = None
+        return depths
+
+    def _collected(self):
+        for name, depth in self.queue_depths().items():
+            if depth is not None:
+                yield "queue_depth", "gauge", {"queue": name}, depth
+        for collector in list(self._collectors):
+            try:
+                yield from collector()
+            except Exception:
+                continue
+
+    def prometheus(self):
+        """All histograms, counters and collected values in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        if histograms:
+            name = f"{PREFIX}_stage_seconds"
+            lines.append(f"# HELP {name} Duration of announcement pipeline stages.")
+            lines.append(f"# TYPE {name} histogram")
+            for (stage, labels), histogram in histograms:
+                labels = {"stage": stage, **dict(labels)}
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        samples = [(name, "counter", dict(labels), value) for (name, labels), value in counters]
+        samples.extend(self._collected())
+        typed = set()
+        for name, kind, labels, value in sorted(samples, key=lambda sample: sample[0]):
+            name = f"{PREFIX}_{name}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{stage: {"count", "sum", "p50", "p95"}} with all label combinations of a stage merged."""
+        merged = {}
+        with self._lock:
+            for (stage, _), histogram in self.histograms.items():
+                entry = merged.setdefault(stage, {"count": 0, "sum": 0.0, "recent": []})
+                entry["count"] += histogram.count
+                entry["sum"] += histogram.sum
+                entry["recent"].extend(histogram.recent)
+        return {
+            stage: {
+                "count": entry["count"],
+                "sum": entry["sum"],
+                "p50": percentile(entry["recent"], 50),
+                "p95": percentile(entry["recent"], 95),
+            }
+            for stage, entry in merged.items()
+        }
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Metrics()
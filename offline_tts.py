@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+WORKER_FLAG = "--offline-tts-worker"
+
+
+def worker_main():
+    """Entry point of the worker process: one pyttsx3 engine, requests as JSON lines on stdin."""
+    import pyttsx3
+
+    # stdout patří protokolu, případné výpisy pyttsx3/ovladačů pošleme do stderr
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    def send(message):
+        protocol.write(json.dumps(message) + "\n")
+        protocol.flush()
+
+    try:
+        engine = pyttsx3.init()
+        available = engine.getProperty("voices")
+        female = next((voice for voice in available if "female" in voice.name.lower()), available[1] if len(available) > 1 else available[0])
+        male = next((voice for voice in available if "male" in voice.name.lower() and "female" not in voice.name.lower()), available[0])
+        voices = {"male": male.id, "female": female.id}
+        engine.setProperty("volume", 1.0)
+    except Exception as e:
+        send({"error": f"pyttsx3 initialisation failed: {e}"})
+        return
+    send({"voices": voices})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            engine.setProperty("rate", request["rate"])
+            engine.setProperty("voice", voices.get(request["voice"], request["voice"]))
+            engine.save_to_file(request["text"], request["path"])
+            engine.runAndWait()
+            if not os.path.exists(request["path"]) or os.path.getsize(request["path"]) == 0:
+                raise RuntimeError("engine produced no audio")
+            send({"id": request["id"], "path": request["path"]})
+        except Exception as e:
+            send({"id": request["id"], "error": str(e)})
+
+
+class OfflineTTS:
+    """Long-lived pyttsx3 worker process that renders text into audio files.
+
+    The engine is initialised and the voices ("male"/"female") are resolved
+    once per worker; every render is a ``save_to_file`` call, so the result
+    can go through the same effect, cache and playback pipeline as OpenAI
+    audio. A worker that dies or hangs is restarted on the next request.
+    """
+
+    def __init__(self, timeout=120):
+        self.timeout = timeout
+        self.voices = {}
+        self._process = None
+        self._responses = None
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _command():
+        if getattr(sys, "frozen", False):
+            # Zabalená aplikace: main.py na tento přepínač spustí jen worker
+            return [sys.executable, WORKER_FLAG]
+        return [sys.executable, os.path.abspath(__file__), WORKER_FLAG]
+
+    def _start(self):
+        logger.info("Starting offline TTS worker...")
+        creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        self._process = subprocess.Popen(
+            self._command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1, creationflags=creationflags
+        )
+        self._responses = queue.Queue()
+        threading.Thread(target=self._read, args=(self._process, self._responses), name="offline-tts-reader", daemon=True).start()
+        ready = self._responses.get(timeout=self.timeout)
+        if ready is None or "error" in ready:
+            self._stop()
+            raise RuntimeError(ready["error"] if ready else "offline TTS worker exited")
+        self.voices = ready["voices"]
+        logger.info(f"Offline TTS worker ready (voices: {self.voices})")
+
+    @staticmethod
+    def _read(process, responses):
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line))
+            except ValueError:
+                logger.debug(f"Offline TTS worker: {line.rstrip()}")
+        responses.put(None)
+
+    def _stop(self):
+        if self._process is not None:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    def start(self):
+        """Start the worker ahead of the first announcement."""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+        return self
+
+    def render(self, text, voice, rate, path):
+        """Render ``text`` with the "male"/"female" voice at ``rate`` words per minute into ``path``."""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start()
+            self._counter += 1
+            request_id = self._counter
+            self._process.stdin.write(json.dumps({"id": request_id, "text": text, "voice": voice, "rate": rate, "path": path}) + "\n")
+            self._process.stdin.flush()
+            try:
+                response = self._responses.get(timeout=self.timeout)
+            except queue.Empty:
+                self._stop()
+                raise TimeoutError(f"Offline TTS did not finish within {self.timeout}s")
+            if response is None:
+                self._stop()
+                raise RuntimeError("offline TTS worker exited")
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response["path"]
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+            self._stop()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Return the process-wide offline TTS worker (started on first render)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OfflineTTS()
+        return _worker
+
+
+if __name__ == "__main__" and WORKER_FLAG in sys.argv:
+    worker_main()
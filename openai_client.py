@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import openai
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that shrinks on rate limiting and slowly grows back (AIMD).
+
+    Background requests (pre-rendering) only start while no foreground request
+    is waiting, and they leave one slot free for announcements that are due now.
+    """
+
+    def __init__(self, initial, maximum, minimum=1):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.active = 0
+        self.waiting = 0
+        self._cond = asyncio.Condition()
+
+    def _has_slot(self, background):
+        if background:
+            return self.waiting == 0 and self.active < max(1, int(self.limit) - 1)
+        return self.active < int(self.limit)
+
+    async def acquire(self, background=False):
+        async with self._cond:
+            if not background:
+                self.waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self._has_slot(background))
+            finally:
+                if not background:
+                    self.waiting -= 1
+            self.active += 1
+
+    async def release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.release()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit / 2)
+        logger.warning(f"OpenAI rate limited, concurrency lowered to {int(self.limit)}")
+
+
+class OpenAIClient:
+    """asyncio client for chat completions and speech, used from worker threads.
+
+    All requests run on one event loop in a background thread with a shared,
+    pooled HTTP connection. Each call has an overall deadline; 429/5xx and
+    connection errors are retried with full-jitter exponential backoff
+    (honouring Retry-After), and the number of parallel requests adapts to
+    observed rate limiting. ``base_url`` may point at a local stand-in server.
+    Calls made inside ``with client.background():`` yield to the others.
+    """
+
+    def __init__(self, api_key, base_url=None, timeout=60.0, max_concurrency=4, max_retries=4,
+                 backoff_base=0.5, backoff_cap=8.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0}
+        self._loop = None
+        self._client = None
+        self._limiter = None
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def background(self):
+        """Mark API calls of the current thread as low priority (e.g. pre-rendering)."""
+        previous = getattr(self._local, "background", False)
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = previous
+
+    def _is_background(self):
+        return getattr(self._local, "background", False)
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                threading.Thread(target=self._run_loop, name="openai-client", daemon=True).start()
+                self._started.wait()
+        return self._loop
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._limiter = AdaptiveLimiter(self.max_concurrency, self.max_concurrency)
+        self._client = openai.AsyncOpenAI(
+            api_key=self.api_key or "missing",
+            base_url=self.base_url or None,
+            timeout=self.timeout,
+            max_retries=0,  # opakování řešíme sami
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2, max_keepalive_connections=self.max_concurrency),
+                timeout=self.timeout
+            )
+        )
+        self._loop = loop
+        self._started.set()
+        loop.run_forever()
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _retry_delay(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+    async def _call(self, name, request, deadline, background=False):
+        """Run ``request(timeout)`` with retries until it succeeds or the deadline passes."""
+        deadline_at = time.monotonic() + (deadline or self.timeout)
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.stats["failures"] += 1
+                raise TimeoutError(f"OpenAI {name} deadline exceeded")
+            try:
+                await self._limiter.acquire(background)
+                try:
+                    self.stats["calls"] += 1
+                    started = time.perf_counter()
+                    result = await asyncio.wait_for(request(min(remaining, self.timeout)), remaining)
+                finally:
+                    await self._limiter.release()
+                metrics.registry.observe("api_request", time.perf_counter() - started, endpoint=name)
+                metrics.registry.inc("openai_requests_total", endpoint=name, outcome="ok")
+                self._limiter.on_success()
+                return result
+            except Exception as e:
+                retryable = isinstance(e, asyncio.TimeoutError) or self._is_retryable(e)
+                throttled = isinstance(e, openai.APIStatusError) and e.status_code == 429
+                metrics.registry.inc("openai_requests_total", endpoint=name, outcome="throttled" if throttled else "error")
+                if throttled:
+                    self.stats["throttled"] += 1
+                    self._limiter.on_throttle()
+                if not retryable or attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                delay = self._retry_delay(attempt, e)
+                if time.monotonic() + delay >= deadline_at:
+                    self.stats["failures"] += 1
+                    raise
+                attempt += 1
+                self.stats["retries"] += 1
+                logger.warning(f"OpenAI {name} failed ({e}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def chat(self, model, messages, deadline=None):
+        """Return the text of a chat completion."""
+        async def request(timeout):
+            response = await self._client.chat.completions.create(model=model, messages=messages, timeout=timeout)
+            return response.choices[0].message.content
+        return self._submit(self._call("chat", request, deadline, self._is_background())).result()
+
+    def speech(self, model, voice, text, speed=1.0, response_format="mp3", deadline=None):
+        """Return the synthesized audio as bytes."""
+        async def request(timeout):
+            response = await self._client.audio.speech.create(
+                model=model, voice=voice, input=text, speed=speed, response_format=response_format, timeout=timeout
+            )
+            return response.content
+        return self._submit(self._call("speech", request, deadline, self._is_background())).result()
+
+    def stream_speech(self, model, voice, text, speed=1.0, response_format="pcm", chunk_size=4800, deadline=None):
+        """Yield synthesized audio bytes as they arrive (retries only happen before the first byte)."""
+        chunks = queue.Queue()
+        done = object()
+        cancelled = threading.Event()
+        background = self._is_background()
+
+        async def request(timeout):
+            # Spojení otevřeme ručně, aby mohlo zůstat otevřené i po návratu z _call
+            context = self._client.audio.speech.with_streaming_response.create(
+                model=model, voice=voice, input=text, speed=speed, response_format=response_format, timeout=timeout
+            )
+            response = await context.__aenter__()
+            try:
+                iterator = response.iter_bytes(chunk_size).__aiter__()
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = b""
+            except BaseException:
+                await context.__aexit__(None, None, None)
+                raise
+            return context, iterator, first
+
+        async def pump():
+            context = None
+            try:
+                context, iterator, first = await self._call("speech stream", request, deadline, background)
+                if first:
+                    chunks.put(first)
+                    async for data in iterator:
+                        if cancelled.is_set():
+                            break
+                        chunks.put(data)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                if context is not None:
+                    await context.__aexit__(None, None, None)
+                chunks.put(done)
+
+        self._submit(pump())
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
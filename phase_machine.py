@@ -0,0 +1,226 @@
+import logging
+import queue
+import threading
+import time
+
+import events
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fáze z flight_data_sender.lua, které jsou jen variantou jiné fáze
+PHASE_ALIASES = {
+    "Taxi (Lights On)": "Taxi",
+    "Final Approach (Landing Lights)": "Final",
+}
+
+# Pořadí fází během letu (pro posouzení, zda dlužné hlášení ještě dává smysl)
+PHASE_ORDER = [
+    "Gate", "Pushback", "Taxi", "Takeoff", "Climb", "Cruise", "Descent",
+    "Approach", "Final", "Landing", "TaxiAfterLanding", "Deboarding"
+]
+
+# Povolené přechody; ostatní se přijmou jen pokud vydrží RESYNC_SECONDS (např. načtení letu ve vzduchu)
+TRANSITIONS = {
+    "Unknown": set(PHASE_ORDER),
+    "Gate": {"Pushback", "Taxi", "Takeoff"},
+    "Pushback": {"Gate", "Taxi", "Takeoff"},
+    "Taxi": {"Pushback", "Takeoff", "Gate"},
+    "Takeoff": {"Climb", "Taxi"},
+    "Climb": {"Cruise", "Descent", "Approach"},
+    "Cruise": {"Climb", "Descent"},
+    "Descent": {"Cruise", "Climb", "Approach", "Final"},
+    "Approach": {"Descent", "Climb", "Final", "Landing"},
+    "Final": {"Approach", "Climb", "Landing", "TaxiAfterLanding"},
+    "Landing": {"TaxiAfterLanding", "Deboarding", "Gate"},
+    "TaxiAfterLanding": {"Deboarding", "Gate"},
+    "Deboarding": {"Gate"},
+}
+RESYNC_SECONDS = 30
+
+# Jak dlouho musí nová fáze vydržet, než ji přijmeme (hystereze proti kmitání na hranicích)
+DEFAULT_DEBOUNCE_SECONDS = 1.0
+PHASE_DEBOUNCE_SECONDS = {"Cruise": 10.0, "Descent": 5.0, "Climb": 3.0}
+
+# Hlášení dlužná po vstupu do fáze: (název, pauza před ním v sekundách)
+PHASE_JOBS = {
+    "Gate": [("AirportBoarding", 0), ("Gate", 2)],
+    "Pushback": [("Pushback", 0), ("Safety", 5)],
+    "Takeoff": [("Takeoff", 0)],
+    "Descent": [("Descent", 0)],
+    "Final": [("Final", 0)],
+    "TaxiAfterLanding": [("TaxiAfterLanding", 0)],
+    "Deboarding": [("Deboarding", 0)],
+}
+
+
+def normalize_phase(phase):
+    return PHASE_ALIASES.get(phase, phase)
+
+
+class AnnouncementJob:
+    def __init__(self, name, phase, pause):
+        self.name = name
+        self.phase = phase
+        self.pause = pause
+        self.status = "owed"
+        self.owed_since = time.time()
+
+    def is_stale(self, current_phase):
+        """An announcement more than one phase behind the aircraft is no longer worth playing."""
+        if self.phase not in PHASE_ORDER or current_phase not in PHASE_ORDER:
+            return False
+        return PHASE_ORDER.index(current_phase) - PHASE_ORDER.index(self.phase) > 1
+
+    def __repr__(self):
+        return f"<AnnouncementJob {self.name} ({self.phase}) {self.status}>"
+
+
+class PhaseStateMachine:
+    """Turns telemetry snapshots into confirmed flight phases and owed announcements.
+
+    A detector thread blocks on new telemetry versions, so a phase change is
+    seen immediately. A new phase must persist for its debounce time and be
+    an allowed transition from the confirmed phase (or persist for
+    RESYNC_SECONDS). Each confirmed phase records the announcements it owes;
+    a separate dispatcher thread plays them in order via ``play(name,
+    snapshot)``, so a long announcement never delays detection.
+
+    ``time_scale`` shortens the debounce and resync times when telemetry is
+    replayed faster than real time.
+    """
+
+    def __init__(self, telemetry_store, play, played=None, disabled=(), debounce_seconds=DEFAULT_DEBOUNCE_SECONDS, time_scale=1.0):
+        self.telemetry_store = telemetry_store
+        self.play = play
+        self.played = played if played is not None else set()
+        self.disabled = set(disabled)
+        self.debounce_seconds = debounce_seconds
+        self.time_scale = time_scale
+        self.phase = "Unknown"
+        self.history = []
+        self.jobs = []
+        self._candidate = None
+        self._rejected = None
+        self._queue = queue.Queue()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._detector = threading.Thread(target=self._run_detector, name="phase-detector", daemon=True)
+        self._dispatcher = threading.Thread(target=self._run_dispatcher, name="announcement-dispatcher", daemon=True)
+
+    def start(self):
+        metrics.registry.register_queue("owed_announcements", lambda: len(self.owed()))
+        self._detector.start()
+        self._dispatcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+
+    def wait(self):
+        """Block the calling thread for as long as the machine runs."""
+        self._detector.join()
+
+    def on_phase_change(self, callback):
+        """Register ``callback(old_phase, new_phase, snapshot)``, called on the detector thread."""
+        self._listeners.append(callback)
+
+    def owed(self):
+        """Announcements that are owed or currently playing."""
+        with self._lock:
+            return [job for job in self.jobs if job.status in ("owed", "playing")]
+
+    def debounce_for(self, phase):
+        return PHASE_DEBOUNCE_SECONDS.get(phase, self.debounce_seconds) / self.time_scale
+
+    def _run_detector(self):
+        version = -1
+        while not self._stop.is_set():
+            timeout = 1.0
+            if self._candidate:
+                phase, since, _ = self._candidate
+                deadline = since + self.debounce_for(phase)
+                if deadline <= time.monotonic():
+                    # Odmítnutý přechod čeká na resync, nemá smysl se budit dřív
+                    deadline = since + RESYNC_SECONDS / self.time_scale
+                timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+            snapshot = self.telemetry_store.wait_for_version(version, timeout=timeout)
+            if snapshot is not None:
+                version = snapshot.version
+                self._observe(snapshot)
+            self._check_candidate()
+
+    def _observe(self, snapshot):
+        phase = normalize_phase(snapshot.phase)
+        if phase not in TRANSITIONS:
+            return
+        if phase == self.phase:
+            self._candidate = None
+        elif not self._candidate or self._candidate[0] != phase:
+            self._candidate = (phase, time.monotonic(), snapshot)
+        else:
+            self._candidate = (phase, self._candidate[1], snapshot)
+
+    def _check_candidate(self):
+        if not self._candidate:
+            return
+        phase, since, snapshot = self._candidate
+        held = time.monotonic() - since
+        if held < self.debounce_for(phase):
+            return
+        resync = RESYNC_SECONDS / self.time_scale
+        if phase not in TRANSITIONS.get(self.phase, ()) and held < resync:
+            if self._rejected != (self.phase, phase):
+                self._rejected = (self.phase, phase)
+                logger.info(f"Ignoring unexpected transition {self.phase} -> {phase} unless it persists for {resync:g}s")
+            return
+        self._confirm(phase, snapshot)
+
+    def _confirm(self, phase, snapshot):
+        old, self.phase = self.phase, phase
+        self._candidate = None
+        self._rejected = None
+        self.history.append((time.time(), phase))
+        logger.info(f"Flight phase {old} -> {phase}")
+        events.hub.publish("phase", {"phase": phase, "previous": old, "raw": snapshot.phase})
+        with self._lock:
+            for name, pause in PHASE_JOBS.get(phase, []):
+                if name in self.disabled or name in self.played or any(job.name == name and job.status != "skipped" for job in self.jobs):
+                    continue
+                job = AnnouncementJob(name, phase, pause)
+                self.jobs.append(job)
+                self._queue.put(job)
+                events.hub.publish("announcement", {"phase": name, "state": "queued"}, key=name)
+        for callback in self._listeners:
+            try:
+                callback(old, phase, snapshot)
+            except Exception as e:
+                logger.error(f"Phase change listener failed: {e}")
+
+    def _run_dispatcher(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.name in self.played:
+                self._set_status(job, "done")
+                continue
+            if job.is_stale(self.phase):
+                self._set_status(job, "skipped")
+                logger.info(f"Skipping {job.name} announcement, the flight is already in {self.phase}")
+                continue
+            if job.pause:
+                time.sleep(job.pause)
+            job.status = "playing"
+            try:
+                self.play(job.name, self.telemetry_store.snapshot())
+                self._set_status(job, "done")
+            except Exception as e:
+                self._set_status(job, "failed")
+                logger.error(f"Announcement {job.name} failed: {e}")
+
+    def _set_status(self, job, status):
+        job.status = status
+        events.hub.publish("announcement", {"phase": job.name, "state": status}, key=job.name)
@@ -0,0 +1,118 @@
+import threading
+from collections import deque
+
+from phase_machine import normalize_phase
+
+# Prahy z flight_data_sender.lua, které fázi přepnou
+TAKEOFF_SPEED = 50  # kt, rozjezd
+DESCENT_VERTICAL_SPEED = -100  # ft/min, začátek klesání (top of descent)
+FINAL_ALTITUDE = 1000  # ft
+TAXI_AFTER_LANDING_SPEED = 30  # kt
+
+# Odhad doby od konečného přiblížení po odbočení z dráhy
+LANDING_ROLLOUT_SECONDS = 120
+# Pojíždění s rozsvícenými přistávacími světly obvykle znamená vjezd na dráhu
+LINEUP_SECONDS = 60
+
+MIN_SAMPLES = 5
+MIN_SPAN_SECONDS = 5.0
+
+
+def linear_fit(points):
+    """Least-squares line through (t, value) points; returns (slope per second, value at the last t)."""
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_v = sum(v for _, v in points) / n
+    var_t = sum((t - mean_t) ** 2 for t, _ in points)
+    if var_t == 0:
+        return 0.0, points[-1][1]
+    slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / var_t
+    return slope, mean_v + slope * (points[-1][0] - mean_t)
+
+
+def time_to_reach(value, slope, target):
+    """Seconds until a linear trend reaches ``target``; None if it is moving away or flat."""
+    if value == target:
+        return 0.0
+    if slope == 0 or (target - value) / slope < 0:
+        return None
+    return (target - value) / slope
+
+
+class PhasePredictor:
+    """Estimates how soon the next announced phases will be reported.
+
+    The Lua script switches phase only after a threshold is crossed (e.g.
+    Descent at -100 ft/min), which is exactly when the announcement should
+    already be playing. The predictor keeps a rolling window of telemetry
+    snapshots and fits linear trends of altitude, vertical speed and ground
+    speed to estimate the seconds left until each threshold: takeoff roll,
+    top of descent, final and the taxi after landing.
+    """
+
+    def __init__(self, telemetry_store, window_seconds=60):
+        self.telemetry_store = telemetry_store
+        self.window_seconds = window_seconds
+        self._samples = deque()
+        self._lock = threading.Lock()
+        self._unsubscribe = telemetry_store.subscribe(self._on_snapshot)
+        self._on_snapshot(None, telemetry_store.snapshot())
+
+    def close(self):
+        self._unsubscribe()
+
+    def _on_snapshot(self, old, new):
+        with self._lock:
+            self._samples.append((new.timestamp, new.altitude, new.speed, new.vertical_speed))
+            while self._samples and self._samples[0][0] < new.timestamp - self.window_seconds:
+                self._samples.popleft()
+
+    def trends(self):
+        """Slope and current fitted value per quantity, or None while the window is too short."""
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < MIN_SAMPLES or samples[-1][0] - samples[0][0] < MIN_SPAN_SECONDS:
+            return None
+        return {
+            key: linear_fit([(sample[0], sample[index]) for sample in samples])
+            for index, key in enumerate(("altitude", "speed", "vertical_speed"), start=1)
+        }
+
+    def predict(self):
+        """Map announcement phase -> estimated seconds until the sim reports it."""
+        snapshot = self.telemetry_store.snapshot()
+        trends = self.trends()
+        if trends is None:
+            return {}
+        phase = normalize_phase(snapshot.phase)
+        speed_slope, speed = trends["speed"]
+        vs_slope, vertical_speed = trends["vertical_speed"]
+        alt_slope, altitude = trends["altitude"]
+        # Sklony jsou v jednotkách telemetrie za sekundu, takže ETA vychází v sekundách
+        predictions = {}
+
+        if phase in ("Pushback", "Taxi"):
+            eta = time_to_reach(speed, speed_slope, TAKEOFF_SPEED) if speed_slope > 0.3 else None
+            if snapshot.landing_light and phase == "Taxi":
+                eta = LINEUP_SECONDS if eta is None else min(eta, LINEUP_SECONDS)
+            if eta is not None:
+                predictions["Takeoff"] = eta
+
+        if phase in ("Climb", "Cruise") and vertical_speed > DESCENT_VERTICAL_SPEED:
+            eta = time_to_reach(vertical_speed, vs_slope, DESCENT_VERTICAL_SPEED)
+            if eta is not None:
+                predictions["Descent"] = eta
+
+        if phase in ("Descent", "Approach") and alt_slope < 0:
+            eta = time_to_reach(altitude, alt_slope, FINAL_ALTITUDE)
+            if eta is not None:
+                predictions["Final"] = eta
+                predictions["TaxiAfterLanding"] = eta + LANDING_ROLLOUT_SECONDS
+        elif phase == "Final":
+            predictions["TaxiAfterLanding"] = LANDING_ROLLOUT_SECONDS
+        elif phase == "Landing" and speed_slope < 0:
+            eta = time_to_reach(speed, speed_slope, TAXI_AFTER_LANDING_SPEED)
+            if eta is not None:
+                predictions["TaxiAfterLanding"] = eta
+
+        return {name: max(0.0, eta) for name, eta in predictions.items()}
@@ -0,0 +1,298 @@
+import heapq
+import io
+import itertools
+import logging
+import threading
+import time
+
+import numpy as np
+import pygame
+
+import audio_effects
+import events
+import metrics
+import scratch
+
+logger = logging.getLogger(__name__)
+
+# Nižší číslo = vyšší priorita
+PRIORITY_URGENT = 0        # LastCall - přeruší vše ostatní
+PRIORITY_ANNOUNCEMENT = 10
+PRIORITY_BACKGROUND = 20   # náhledy v nastavení
+
+MIXER_FREQUENCY = 44100
+MIXER_CHANNELS = 2
+
+
+class PlaybackItem:
+    """A queued playback job: a sequence of sources played back to back on one channel.
+
+    Sources are appended by the producer (possibly while earlier ones already
+    play) and the item is closed once nothing more will come. Supported sources:
+    a file path, encoded bytes, a ScratchBuffer (the item holds a reference until
+    it is played), a ``(samples, frame_rate)`` tuple, a number of seconds of
+    silence, or an iterator of ``(samples, frame_rate)`` chunks.
+
+    Items created for an ``announcement`` (phase name) report "playing" and
+    their final status as announcement events on the live status feed.
+    """
+
+    def __init__(self, engine, priority, name, announcement=None):
+        self.engine = engine
+        self.priority = priority
+        self.name = name
+        self.announcement = announcement
+        self.status = "queued"
+        self.started_at = None  # time.monotonic() prvního přehraného vzorku
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self._sources = []
+        self._closed = False
+
+    def append(self, source):
+        """Queue another source; ignored once the item was closed, preempted or has finished."""
+        with self.engine._cond:
+            if self._closed or self.done.is_set():
+                return self
+            if isinstance(source, scratch.ScratchBuffer):
+                source.acquire()
+            self._sources.append(source)
+            self.engine._cond.notify_all()
+        return self
+
+    def close(self):
+        with self.engine._cond:
+            self._closed = True
+            self.engine._cond.notify_all()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the item finished, was preempted or failed; returns the final status."""
+        self.done.wait(timeout)
+        return self.status
+
+    def _finish(self, status):
+        # Zdroje, na které po přerušení nedošlo, uvolníme; další append už nic nepřidá
+        with self.engine._cond:
+            remaining, self._sources = self._sources, []
+            self.status = status
+            self.started.set()
+            self.done.set()
+        for source in remaining:
+            if isinstance(source, scratch.ScratchBuffer):
+                source.release()
+        self._publish()
+        logger.info(f"Playback of {self.name or 'audio'} {status}.")
+
+    def _publish(self):
+        if self.announcement:
+            events.hub.publish("announcement", {"phase": self.announcement, "state": self.status}, key=self.announcement)
+
+
+class PlaybackEngine:
+    """Long-lived thread that owns pygame.mixer and plays queued items by priority.
+
+    Items are played gaplessly through ``Channel.queue``. A newly queued item
+    with a higher priority stops the current one (its status becomes
+    "preempted"). Completion is signalled through ``PlaybackItem.done``; the
+    engine sleeps on a condition until the estimated end of the current sound
+    (woken early by preemption) and only then polls the mixer briefly (10-20 ms
+    steps) for the few milliseconds the estimate is off. ``Channel.set_endevent``
+    is not used because pygame events need the display module and a pump on the
+    main thread, which belongs to the Tk GUI.
+    """
+
+    def __init__(self, frequency=MIXER_FREQUENCY, channels=MIXER_CHANNELS):
+        self.frequency = frequency
+        self.channels = channels
+        self.current = None
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._preempt = False
+        self._thread = threading.Thread(target=self._run, name="playback", daemon=True)
+        self._thread.start()
+
+    def open(self, priority=PRIORITY_ANNOUNCEMENT, name="", announcement=None):
+        """Queue a new item whose sources will be appended later."""
+        item = PlaybackItem(self, priority, name, announcement)
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._counter), item))
+            if self.current is not None and priority < self.current.priority:
+                logger.info(f"{name or 'audio'} preempts {self.current.name or 'audio'}")
+                self._preempt = True
+            self._cond.notify_all()
+        return item
+
+    def play(self, sources, priority=PRIORITY_ANNOUNCEMENT, name="", announcement=None):
+        item = self.open(priority, name, announcement)
+        for source in sources:
+            item.append(source)
+        return item.close()
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        try:
+            with metrics.registry.span("mixer_init"):
+                pygame.mixer.init(frequency=self.frequency, size=-16, channels=self.channels)
+            self.frequency, _, self.channels = pygame.mixer.get_init()
+            channel = pygame.mixer.Channel(0)
+        except Exception as e:
+            logger.error(f"Failed to initialise audio mixer: {e}")
+            channel = None
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, item = heapq.heappop(self._heap)
+                self.current = item
+                self._preempt = False
+            if channel is None:
+                item._finish("failed")
+            else:
+                try:
+                    with metrics.registry.span("playback"):
+                        self._play(channel, item)
+                except Exception as e:
+                    logger.error(f"Error during playback of {item.name or 'audio'}: {e}")
+                    channel.stop()
+                    item._finish("failed")
+            with self._cond:
+                self.current = None
+
+    def _next_source(self, item):
+        """Wait for the next source of ``item``; returns None when the item is closed and drained."""
+        with self._cond:
+            while not item._sources and not item._closed and not self._preempt:
+                self._cond.wait()
+            if self._preempt or not item._sources:
+                return None
+            return item._sources.pop(0)
+
+    def _wait_until(self, deadline):
+        """Sleep until ``deadline`` (monotonic); False if a higher priority item arrived meanwhile."""
+        with self._cond:
+            while not self._preempt:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+    def _sounds(self, source):
+        if isinstance(source, scratch.ScratchBuffer):
+            source = source.source()
+        if isinstance(source, str):
+            yield pygame.mixer.Sound(source)
+        elif isinstance(source, (bytes, bytearray)):
+            yield pygame.mixer.Sound(file=io.BytesIO(source))
+        elif isinstance(source, (int, float)):
+            yield self._to_sound(np.zeros(int(source * self.frequency)), self.frequency)
+        elif isinstance(source, tuple):
+            yield self._to_sound(*source)
+        else:
+            # Streamované kousky převzorkujeme se stavem, jinak by na každém přechodu cvaklo
+            resampler, resampler_rate = None, None
+            for samples, frame_rate in source:
+                if frame_rate != resampler_rate:
+                    if resampler is not None:
+                        yield from self._flushed(resampler)
+                    resampler, resampler_rate = audio_effects.StreamingResampler(frame_rate, self.frequency), frame_rate
+                samples = resampler.process(samples)
+                if len(samples):
+                    yield self._to_sound(samples, self.frequency)
+            if resampler is not None:
+                yield from self._flushed(resampler)
+
+    def _flushed(self, resampler):
+        tail = resampler.flush()
+        if tail is not None and len(tail):
+            yield self._to_sound(tail, self.frequency)
+
+    def _to_sound(self, samples, frame_rate):
+        samples = audio_effects.resample(samples, frame_rate, self.frequency)
+        if samples.ndim == 1:
+            samples = np.repeat(samples[:, None], self.channels, axis=1)
+        elif samples.shape[1] != self.channels:
+            samples = np.repeat(audio_effects.to_mono(samples)[:, None], self.channels, axis=1)
+        return pygame.mixer.Sound(buffer=audio_effects.to_pcm_bytes(samples))
+
+    def _play(self, channel, item):
+        # Konec zvuku, který právě hraje, a zvuku čekajícího ve frontě kanálu
+        playing_until = None
+        queued_until = None
+        while True:
+            source = self._next_source(item)
+            if source is None:
+                break
+            sounds = self._sounds(source)
+            try:
+                for sound in sounds:
+                    if self._preempt:
+                        break
+                    now = time.monotonic()
+                    if playing_until is None or (now >= (queued_until or playing_until) and not channel.get_busy()):
+                        channel.play(sound)
+                        if not item.started.is_set():
+                            item.started_at = now
+                            item.status = "playing"
+                            item.started.set()
+                            item._publish()
+                            logger.info(f"Playback of {item.name or 'audio'} started.")
+                        playing_until, queued_until = now + sound.get_length(), None
+                        continue
+                    if queued_until is not None:
+                        # Fronta kanálu pojme jen jeden zvuk, počkáme až se uvolní
+                        if not self._wait_until(playing_until):
+                            break
+                        while channel.get_queue() is not None and self._wait_until(time.monotonic() + 0.01):
+                            pass
+                        playing_until, queued_until = queued_until, None
+                    channel.queue(sound)
+                    queued_until = playing_until + sound.get_length()
+            finally:
+                sounds.close()
+                if isinstance(source, scratch.ScratchBuffer):
+                    source.release()
+                elif hasattr(source, "close"):
+                    source.close()
+            if self._preempt:
+                break
+        if self._preempt:
+            channel.stop()
+            item._finish("preempted")
+            return
+        if playing_until is not None and self._wait_until((queued_until or playing_until)):
+            # Dohrání posledních vzorků (délka je jen odhad)
+            while channel.get_busy() and not self._preempt:
+                self._wait_until(time.monotonic() + 0.02)
+        if self._preempt:
+            channel.stop()
+            item._finish("preempted")
+        else:
+            item._finish("finished")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide playback engine, starting it on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PlaybackEngine()
+        return _engine
+
+
+# Délka fronty přehrávače pro /metrics a /debug/threads (přehrávač se kvůli tomu nespouští)
+metrics.registry.register_queue("playback", lambda: _engine.queue_depth() if _engine else 0)
+
+
+def play(sources, priority=PRIORITY_ANNOUNCEMENT, name="", announcement=None):
+    """Queue sources for playback and return the PlaybackItem (use ``.wait()`` to block)."""
+    return get_engine().play(sources, priority, name, announcement)
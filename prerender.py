@@ -0,0 +1,170 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import announcement_generator as ag
+import metrics
+from phase_predictor import PhasePredictor
+
+logger = logging.getLogger(__name__)
+
+# Hlášení, jejichž text je po potvrzení letu známý předem
+STATIC_PHASES = ["Pushback", "Takeoff", "Descent", "Final", "Deboarding", "InflightService"]
+
+# Hlášení závislá na živých datech (teplota, místní čas) a fáze těsně před nimi, kdy je má smysl renderovat
+DYNAMIC_PHASES = {
+    "TaxiAfterLanding": {"Final", "Final Approach (Landing Lights)", "Landing"},
+}
+
+# Odhad délky renderu, dokud ho pro danou fázi nezměříme, a rezerva navíc
+DEFAULT_RENDER_SECONDS = 30
+LEAD_MARGIN_SECONDS = 20
+
+# Jediné vlákno pro předběžné renderování, živá hlášení mají render_executor pro sebe
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prerender")
+metrics.registry.register_queue("prerender", lambda: executor._work_queue.qsize())
+
+
+class PrerenderScheduler:
+    """Renders announcements of later phases in the background while the aircraft is boarding.
+
+    Rendering goes through the same translate -> TTS -> PA pipeline as
+    play_announcement, so the results land in the translation and audio
+    caches and the later play_announcement call only reads them back.
+    Each phase is re-rendered only when its formatted text changes.
+    Renders run one language at a time on this module's own executor and
+    their API calls are low priority, so they yield to announcements that
+    are due now.
+
+    A PhasePredictor estimates when the next phases will be reported; a
+    phase is (re-)rendered once its estimate drops below the measured
+    render time plus a margin, so dynamic announcements carry fresh data
+    and the audio is ready at the transition. The local time in their text
+    is the predicted time of the transition (rounded like at play time), so
+    the rendered audio still matches when the announcement is played.
+    """
+
+    def __init__(self, flight_info, telemetry_store, all_langs_sorted, airport_langs, style,
+                 aircraft=None, safety_langs=None, refresh_seconds=120):
+        self.flight_info = flight_info
+        self.telemetry_store = telemetry_store
+        self.all_langs_sorted = all_langs_sorted
+        self.airport_langs = airport_langs
+        self.style = style
+        self.aircraft = aircraft
+        self.safety_langs = safety_langs
+        self.refresh_seconds = refresh_seconds
+        self.rendered_texts = {}
+        self._last_render = {}
+        self.render_seconds = {}
+        self.predictor = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.predictor = PhasePredictor(self.telemetry_store)
+        self._thread = threading.Thread(target=self._run, name="prerender", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @staticmethod
+    def _render_language(*args):
+        with ag.api.background():
+            return ag.render_language(*args)
+
+    def _render(self, phase, text, langs, voice, speed, style):
+        config = ag.check()
+        with ag.api.background():
+            ag.prepare_translations(config, text, langs, style)
+        futures = [
+            executor.submit(self._render_language, config, text, lang, style, voice, f"prerender_{phase}_{lang}.mp3", speed)
+            for lang in langs
+        ]
+        files = [filename for _, filename in ag.wait_for_rendered(futures, langs)]
+        ag.cleanup_audio_files(files)
+        return all(files)
+
+    def render_phase(self, phase, eta=None):
+        """Render one phase if its text changed since the last render; True when the audio is ready.
+
+        ``eta`` (seconds until the phase is expected) moves the local time to the moment it will be played.
+        """
+        if phase in ag.played_announcements:
+            return True
+        snapshot = self.telemetry_store.snapshot()
+        if eta is not None and snapshot.local_time is None:
+            snapshot = snapshot.replace(snapshot.version, {"local_time": time.strftime("%H:%M", time.localtime(time.time() + eta))})
+        text = ag.format_announcement_text(phase, dict(self.flight_info), snapshot)
+        if not text:
+            return False
+        if self.rendered_texts.get(phase) == text:
+            return True
+        langs = ag.announcement_languages(phase, self.flight_info, self.all_langs_sorted, self.airport_langs)
+        voice, speed = ag.announcement_voice(phase)
+        logger.info(f"Pre-rendering {phase} announcement ({', '.join(langs)})")
+        started = time.time()
+        if self._render(phase, text, langs, voice, speed, self.style):
+            self.rendered_texts[phase] = text
+            self.render_seconds[phase] = time.time() - started
+            logger.info(f"Pre-rendered {phase} in {self.render_seconds[phase]:.1f}s")
+            return True
+        return False
+
+    def render_safety(self):
+        if not self.safety_langs or not self.aircraft or "Safety" in self.rendered_texts:
+            return
+        text = ag.generate_safety_announcement_text(self.aircraft)
+        logger.info(f"Pre-rendering safety demo ({', '.join(self.safety_langs)})")
+        if self._render("Safety", text, self.safety_langs, ag.voice_crew, 1.0, "professional"):
+            self.rendered_texts["Safety"] = text
+
+    def _run(self):
+        if ag.check().get("announcement_generator", "openai") != "openai":
+            logger.info("Pre-rendering is only available with the OpenAI generator.")
+            return
+        try:
+            self.render_phase("Pushback")
+            self.render_safety()
+            for phase in STATIC_PHASES[1:]:
+                if self._stop.is_set():
+                    return
+                self.render_phase(phase)
+        except Exception as e:
+            logger.error(f"Pre-rendering failed: {e}")
+
+        # Dynamická hlášení hlídáme, dokud nejsou přehraná
+        while not self._stop.wait(2):
+            predictions = self.predictor.predict()
+            for phase, eta in sorted(predictions.items(), key=lambda item: item[1]):
+                if phase in ag.played_announcements or eta > self.lead_seconds(phase):
+                    continue
+                if time.time() - self._last_render.get(phase, 0) < self.refresh_seconds:
+                    continue
+                logger.debug(f"{phase} expected in {eta:.0f}s")
+                self._last_render[phase] = time.time()
+                try:
+                    self.render_phase(phase, eta)
+                except Exception as e:
+                    logger.error(f"Pre-rendering of {phase} failed: {e}")
+            # Bez odhadu (např. vyrovnaný let) se držíme aktuální fáze
+            for phase, active_phases in DYNAMIC_PHASES.items():
+                if phase in ag.played_announcements or phase in predictions or self.telemetry_store.snapshot().phase not in active_phases:
+                    continue
+                if time.time() - self._last_render.get(phase, 0) < self.refresh_seconds:
+                    continue
+                self._last_render[phase] = time.time()
+                try:
+                    self.render_phase(phase)
+                except Exception as e:
+                    logger.error(f"Pre-rendering of {phase} failed: {e}")
+            if all(phase in ag.played_announcements for phase in STATIC_PHASES[:-1] + list(DYNAMIC_PHASES)):
+                self.predictor.close()
+                return
+
+    def lead_seconds(self, phase):
+        """How long before the predicted transition rendering of ``phase`` has to start."""
+        return self.render_seconds.get(phase, DEFAULT_RENDER_SECONDS) + LEAD_MARGIN_SECONDS
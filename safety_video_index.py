@@ -0,0 +1,247 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+
+import audio_effects
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SAFETY_VIDEO_DIR = os.path.join(audio_effects.SCRIPT_DIR, "safety_videos")
+SAFETY_CACHE_DIR = os.path.join(audio_effects.SCRIPT_DIR, "cache", "safety")
+SAFETY_AUDIO_RATE = 44100
+PLAYBACK_CHUNK_SECONDS = 0.5
+
+# Typ letadla v názvu souboru (B738, A20N, E190, DH8D...) - na rozdíl od jazyka obsahuje číslici
+AIRCRAFT_TOKEN_RE = re.compile(r"^[A-Z][A-Z0-9]{1,3}$")
+
+
+def aircraft_designators(aircraft):
+    """ICAO type designators that may stand for an aircraft name like "Boeing 737-800" (B738) or "A320neo" (A20N)."""
+    text = (aircraft or "").upper()
+    words = [word for word in re.split(r"[\s/,()]+", text) if word]
+    codes = {word for word in words if AIRCRAFT_TOKEN_RE.match(word) and any(c.isdigit() for c in word)}
+    compact = re.sub(r"[^A-Z0-9]", "", text)
+    boeing = re.search(r"7([0-8])7(?:-?(\d))?", text)
+    if boeing:
+        family, variant = boeing.groups()
+        max_variant = re.search(r"MAX\s*-?(\d+)", text)
+        if family == "3" and max_variant:
+            codes.add(f"B3{max_variant.group(1)[0]}M")
+        elif family == "7" and "300ER" in compact:
+            codes.add("B77W")
+        elif variant:
+            codes.add(f"B7{family}{variant}")
+    airbus = re.search(r"A?3([1-8]\d)(NEO)?(?:-?(\d))?", compact if "AIRBUS" in text or compact.startswith("A3") else "")
+    if airbus:
+        family, neo, variant = airbus.groups()
+        if neo:
+            codes.add(f"A{family}N")
+        elif family in ("18", "19", "20", "21"):
+            codes.add(f"A3{family}")
+        elif family == "80":
+            codes.add("A388")
+        elif variant:
+            codes.add(f"A3{family[0]}{variant}")
+    embraer = re.search(r"E(?:MB|RJ)?-?1([79]\d)", compact)
+    if embraer:
+        codes.add(f"E1{embraer.group(1)}")
+    return codes
+
+
+def parse_video_name(filename):
+    """Return (airline ICAO, aircraft type or None) encoded in a name like ``RYR_B738_EN.mp4``."""
+    tokens = [token for token in re.split(r"[_\-\s.]+", os.path.splitext(filename)[0].upper()) if token]
+    if not tokens:
+        return None, None
+    aircraft = next((token for token in tokens[1:] if AIRCRAFT_TOKEN_RE.match(token) and any(c.isdigit() for c in token)), None)
+    return tokens[0], aircraft
+
+
+class SafetyVideoIndex:
+    """Index of safety_videos/ keyed by airline ICAO, with the cabin ("distant") audio prepared ahead of time.
+
+    The directory is rescanned only when its mtime changes and the index is
+    persisted in the cache folder. For each video the decoded and filtered
+    audio is stored as raw 16-bit stereo PCM keyed by (file, mtime, size),
+    so replacing a video invalidates it; playback then streams straight from
+    that file without decoding at Pushback.
+    """
+
+    def __init__(self, video_dir=SAFETY_VIDEO_DIR, cache_dir=SAFETY_CACHE_DIR, fs=SAFETY_AUDIO_RATE):
+        self.video_dir = video_dir
+        self.cache_dir = cache_dir
+        self.fs = fs
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self._lock = threading.RLock()
+        self._preparing = {}
+        self._dir_mtime = None
+        self._videos = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._dir_mtime = data.get("dir_mtime")
+            self._videos = data.get("videos", {})
+        except (OSError, ValueError):
+            self._dir_mtime, self._videos = None, {}
+
+    def _save(self):
+        tmp_path = self.index_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dir_mtime": self._dir_mtime, "videos": self._videos}, f, indent=1)
+        os.replace(tmp_path, self.index_file)
+
+    def refresh(self):
+        """Rescan the video folder if it changed since the last scan."""
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.video_dir).st_mtime_ns
+            except OSError:
+                logger.error(f"Folder '{self.video_dir}' doesn't exist!")
+                self._videos = {}
+                return
+            if dir_mtime == self._dir_mtime:
+                return
+            videos = {}
+            for entry in os.scandir(self.video_dir):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                icao, aircraft = parse_video_name(entry.name)
+                previous = self._videos.get(entry.name, {})
+                videos[entry.name] = {
+                    "icao": icao,
+                    "aircraft": aircraft,
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    # Připravené audio zůstává platné jen pro nezměněný soubor
+                    "audio": previous.get("audio") if previous.get("mtime") == stat.st_mtime_ns and previous.get("size") == stat.st_size else None,
+                }
+            for name, entry in self._videos.items():
+                if entry.get("audio") and videos.get(name, {}).get("audio") != entry["audio"]:
+                    self._remove_audio(entry["audio"])
+            self._videos = videos
+            self._dir_mtime = dir_mtime
+            self._save()
+            logger.info(f"Indexed {len(videos)} safety videos in {self.video_dir}")
+
+    def _remove_audio(self, audio_name):
+        try:
+            os.remove(os.path.join(self.cache_dir, audio_name))
+        except OSError:
+            pass
+
+    def find(self, icao_code, aircraft=None):
+        """Paths of videos for the airline, those for ``aircraft`` (type or name from flight info) first.
+
+        Names without separators (``RYREN.wav``) match by prefix like before the index.
+        """
+        if not icao_code:
+            return []
+        self.refresh()
+        icao_code = icao_code.upper()
+        designators = aircraft_designators(aircraft)
+        with self._lock:
+            matches = [(name, entry) for name, entry in sorted(self._videos.items())
+                       if entry["icao"] == icao_code or name.upper().startswith(icao_code)]
+        matches.sort(key=lambda item: 0 if item[1]["aircraft"] in designators else 1)
+        return [os.path.join(self.video_dir, name) for name, _ in matches]
+
+    def _entry(self, video_path):
+        name = os.path.basename(video_path)
+        if os.path.abspath(os.path.dirname(video_path)) != os.path.abspath(self.video_dir):
+            return name, None
+        self.refresh()
+        entry = self._videos.get(name)
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return name, None
+        if entry and (entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size):
+            # Soubor přepsaný na místě nemusí změnit mtime složky
+            self._dir_mtime = None
+            self.refresh()
+            entry = self._videos.get(name)
+        return name, entry
+
+    def audio_key(self, name, entry):
+        payload = json.dumps({"file": name, "mtime": entry["mtime"], "size": entry["size"], "fs": self.fs, "effect": "distant"}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest() + ".pcm"
+
+    def prepared_audio(self, video_path):
+        """Path of the prepared PCM for the video, or None if it is not ready (yet)."""
+        with self._lock:
+            name, entry = self._entry(video_path)
+            if not entry or not entry.get("audio"):
+                return None
+            path = os.path.join(self.cache_dir, entry["audio"])
+            return path if os.path.exists(path) and os.path.getsize(path) > 0 else None
+
+    def prepare(self, video_path):
+        """Decode and filter the video's audio into the cache (blocking); returns the PCM path."""
+        existing = self.prepared_audio(video_path)
+        if existing:
+            return existing
+        with self._lock:
+            name, entry = self._entry(video_path)
+            if not entry:
+                raise FileNotFoundError(f"{video_path} is not in {self.video_dir}")
+            audio_name = self.audio_key(name, entry)
+        path = os.path.join(self.cache_dir, audio_name)
+        tmp_path = path + ".tmp"
+        logger.info(f"Preparing safety video audio for {name}...")
+        chunks = audio_effects.stream_decode(video_path, fs=self.fs, channels=1)
+        with metrics.registry.span("safety_prepare"), open(tmp_path, "wb") as f:
+            for chunk in audio_effects.distant_effect_stream(chunks, self.fs):
+                f.write(audio_effects.to_pcm_bytes(chunk))
+        os.replace(tmp_path, path)
+        with self._lock:
+            if name in self._videos and self._videos[name]["mtime"] == entry["mtime"]:
+                self._videos[name]["audio"] = audio_name
+                self._save()
+        logger.info(f"Safety video audio for {name} is ready.")
+        return path
+
+    def prepare_async(self, video_path):
+        """Prepare the audio on a background thread (at most one job per video)."""
+        with self._lock:
+            thread = self._preparing.get(video_path)
+            if thread and thread.is_alive():
+                return thread
+
+            def run():
+                try:
+                    self.prepare(video_path)
+                except Exception as e:
+                    logger.error(f"Failed to prepare safety video audio for {video_path}: {e}")
+
+            thread = threading.Thread(target=run, name="safety-prepare", daemon=True)
+            self._preparing[video_path] = thread
+            thread.start()
+            return thread
+
+    def stream(self, video_path):
+        """Iterator of (samples, frame_rate) chunks of the prepared audio, or None if not prepared."""
+        path = self.prepared_audio(video_path)
+        if not path:
+            return None
+        pcm = np.memmap(path, dtype=np.int16, mode="r").reshape(-1, 2)
+        step = int(self.fs * PLAYBACK_CHUNK_SECONDS)
+
+        def chunks():
+            for start in range(0, len(pcm), step):
+                yield pcm[start:start + step].astype(np.float64), self.fs
+
+        return chunks()
+
+
+videos = SafetyVideoIndex()
@@ -0,0 +1,225 @@
+import atexit
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import audio_effects
+
+logger = logging.getLogger(__name__)
+
+SCRATCH_DIR = os.path.join(audio_effects.SCRIPT_DIR, "temp")
+TMPFS_DIR = "/dev/shm"
+STALE_SECONDS = 6 * 3600
+
+
+class ScratchBuffer:
+    """A unique piece of scratch audio, held in memory or in a spill file.
+
+    Buffers are reference counted: the creator owns one reference, consumers
+    (e.g. the playback engine) ``acquire`` their own and everybody calls
+    ``release`` when done. The memory or file is freed with the last reference.
+    """
+
+    def __init__(self, arena, name, suffix, data=None, path=None):
+        self.arena = arena
+        self.name = name
+        self.suffix = suffix
+        self.refs = 1
+        self._data = data
+        self._path = path
+
+    @property
+    def in_memory(self):
+        return self._data is not None
+
+    @property
+    def size(self):
+        if self._data is not None:
+            return len(self._data)
+        if self._path is None:
+            return 0
+        try:
+            return os.path.getsize(self._path)
+        except OSError:
+            return 0
+
+    @property
+    def path(self):
+        """File path of the buffer (memory-only buffers have none)."""
+        return self._path
+
+    def source(self):
+        """Bytes of an in-memory buffer or the path of a spilled one, as understood by pydub, ffmpeg and pygame."""
+        return self._data if self._data is not None else self._path
+
+    def read(self):
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def acquire(self):
+        with self.arena._lock:
+            if self.refs <= 0:
+                raise RuntimeError(f"Scratch buffer {self.name} was already released")
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.arena._lock:
+            if self.refs <= 0:
+                return
+            self.refs -= 1
+            if self.refs == 0:
+                self.arena._free(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def __repr__(self):
+        where = "memory" if self.in_memory else self._path or "nowhere (released)"
+        return f"<ScratchBuffer {self.name} {self.size} B in {where}, refs={self.refs}>"
+
+
+class ScratchArena:
+    """Hands out unique scratch buffers instead of fixed names in the temp folder.
+
+    Data is kept in RAM while the total stays under ``memory_budget`` and is
+    spilled to a per-run directory otherwise. Buffers that an external writer
+    fills by path (ffmpeg, the offline TTS worker) go to tmpfs when available;
+    their current size counts against the same budget.
+    Everything left over is removed at exit, and per-run directories of
+    crashed runs are purged on start.
+    """
+
+    def __init__(self, spill_dir=SCRATCH_DIR, memory_budget=64 * 1024 * 1024, tmpfs_dir=TMPFS_DIR):
+        self.spill_dir = spill_dir
+        self.memory_budget = memory_budget
+        self.tmpfs_dir = tmpfs_dir if tmpfs_dir and os.path.isdir(tmpfs_dir) and os.access(tmpfs_dir, os.W_OK) else None
+        self._lock = threading.RLock()
+        self._live = {}
+        self._counter = itertools.count(1)
+        self._run_dirs = {}
+        self._memory_bytes = 0
+        self._peak_memory_bytes = 0
+        self._spills = 0
+        self._allocated = 0
+        self._released = 0
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._purge_stale()
+        atexit.register(self.cleanup)
+
+    def _purge_stale(self):
+        for base in filter(None, [self.spill_dir, self.tmpfs_dir]):
+            try:
+                entries = os.listdir(base)
+            except OSError:
+                continue
+            for entry in entries:
+                path = os.path.join(base, entry)
+                if not entry.startswith("scratch-") or not os.path.isdir(path):
+                    continue
+                try:
+                    if time.time() - os.path.getmtime(path) > STALE_SECONDS:
+                        shutil.rmtree(path, ignore_errors=True)
+                        logger.info(f"Removed stale scratch directory {path}")
+                except OSError:
+                    pass
+
+    def _run_dir(self, base):
+        if base not in self._run_dirs:
+            self._run_dirs[base] = tempfile.mkdtemp(prefix="scratch-", dir=base)
+        return self._run_dirs[base]
+
+    def _unique_name(self, name):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in os.path.splitext(os.path.basename(name or "buffer"))[0])
+        return f"{next(self._counter):06d}_{safe}"
+
+    def put(self, data, suffix=".mp3", name=""):
+        """Store ``data`` and return a new buffer owned by the caller."""
+        with self._lock:
+            unique = self._unique_name(name)
+            self._allocated += 1
+            if self._memory_bytes + self._tmpfs_bytes() + len(data) <= self.memory_budget:
+                buffer = ScratchBuffer(self, unique, suffix, data=bytes(data))
+                self._memory_bytes += len(data)
+                self._peak_memory_bytes = max(self._peak_memory_bytes, self._memory_bytes)
+            else:
+                path = os.path.join(self._run_dir(self.spill_dir), unique + suffix)
+                with open(path, "wb") as f:
+                    f.write(data)
+                self._spills += 1
+                logger.debug(f"Scratch memory budget exhausted, spilled {name or unique} ({len(data)} B) to disk")
+                buffer = ScratchBuffer(self, unique, suffix, path=path)
+            self._live[unique] = buffer
+            return buffer
+
+    def file(self, suffix=".wav", name=""):
+        """Reserve a unique path for an external writer; the file lives on tmpfs while the budget allows."""
+        with self._lock:
+            unique = self._unique_name(name)
+            self._allocated += 1
+            base = self.spill_dir
+            if self.tmpfs_dir:
+                # Soubory na tmpfs jsou taky v RAM, počítají se do stejného rozpočtu
+                if self._memory_bytes + self._tmpfs_bytes() < self.memory_budget:
+                    base = self.tmpfs_dir
+                else:
+                    self._spills += 1
+            buffer = ScratchBuffer(self, unique, suffix, path=os.path.join(self._run_dir(base), unique + suffix))
+            self._live[unique] = buffer
+            return buffer
+
+    def _free(self, buffer):
+        self._live.pop(buffer.name, None)
+        self._released += 1
+        if buffer._data is not None:
+            self._memory_bytes -= len(buffer._data)
+            buffer._data = None
+        elif buffer._path and os.path.exists(buffer._path):
+            try:
+                os.remove(buffer._path)
+            except OSError as e:
+                logger.warning(f"Failed to remove scratch file {buffer._path}: {e}")
+
+    def _on_tmpfs(self, buffer):
+        return bool(self.tmpfs_dir and buffer.path and buffer.path.startswith(self.tmpfs_dir + os.sep))
+
+    def _tmpfs_bytes(self):
+        return sum(buffer.size for buffer in self._live.values() if self._on_tmpfs(buffer))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "live_buffers": len(self._live),
+                "memory_bytes": self._memory_bytes,
+                "peak_memory_bytes": self._peak_memory_bytes,
+                "tmpfs_bytes": self._tmpfs_bytes(),
+                "disk_bytes": sum(buffer.size for buffer in self._live.values() if not buffer.in_memory and not self._on_tmpfs(buffer)),
+                "memory_budget": self.memory_budget,
+                "spills": self._spills,
+                "allocated": self._allocated,
+                "released": self._released,
+            }
+
+    def cleanup(self):
+        """Free every live buffer and remove the per-run directories."""
+        with self._lock:
+            if self._live:
+                logger.info(f"Cleaning up {len(self._live)} scratch buffers ({self.stats()})")
+            for buffer in list(self._live.values()):
+                buffer.refs = 0
+                self._free(buffer)
+            for path in self._run_dirs.values():
+                shutil.rmtree(path, ignore_errors=True)
+            self._run_dirs.clear()
+
+
+arena = ScratchArena()
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections.abc import Mapping
+
+FIELDS = ("phase", "altitude", "speed", "vertical_speed", "beacon", "strobe", "taxi_light", "landing_light", "temperature", "local_time")
+
+DEFAULTS = {
+    "phase": "Unknown",
+    "altitude": 0,
+    "speed": 0,
+    "vertical_speed": 0,
+    "beacon": 0,
+    "strobe": 0,
+    "taxi_light": 0,
+    "landing_light": 0,
+    "temperature": 20.0,
+    "local_time": None,  # simulátor ho neposílá, hlášení pak použije systémový čas
+}
+
+
+class TelemetrySnapshot(Mapping):
+    """Immutable telemetry sample with a version number.
+
+    Values are slots (``snapshot.phase``) and the snapshot is also a read-only
+    mapping (``snapshot["phase"]``, ``.get()``, ``dict(snapshot)``), so code
+    written for the old flight_data dict keeps working.
+    """
+
+    __slots__ = FIELDS + ("version", "timestamp")
+
+    def __init__(self, version=0, timestamp=None, **values):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "timestamp", time.time() if timestamp is None else timestamp)
+        for key in FIELDS:
+            object.__setattr__(self, key, values.get(key, DEFAULTS[key]))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("TelemetrySnapshot is immutable")
+
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def replace(self, version, changes):
+        values = {key: getattr(self, key) for key in FIELDS}
+        values.update(changes)
+        return TelemetrySnapshot(version, **values)
+
+    def __repr__(self):
+        return f"TelemetrySnapshot(v{self.version}, " + ", ".join(f"{key}={getattr(self, key)!r}" for key in FIELDS) + ")"
+
+
+class TelemetryStore:
+    """Thread-safe holder of the latest TelemetrySnapshot.
+
+    Writers call ``update``; a new snapshot (version + 1) is published only
+    when a value actually changed. Readers take ``snapshot()`` without
+    locking, block on ``wait_for_version`` / ``wait_for_phase_change``
+    instead of sleep-polling, or ``subscribe`` a callback that runs on the
+    writer's thread with (old, new) snapshots.
+    """
+
+    def __init__(self, **initial):
+        self._snapshot = TelemetrySnapshot(0, **initial)
+        self._cond = threading.Condition()
+        self._subscribers = []
+
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def update(self, changes):
+        """Apply known fields from ``changes``; returns the current snapshot."""
+        with self._cond:
+            old = self._snapshot
+            changes = {key: value for key, value in changes.items() if key in FIELDS and old[key] != value}
+            if not changes:
+                return old
+            new = old.replace(old.version + 1, changes)
+            self._snapshot = new
+            self._cond.notify_all()
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(old, new)
+        return new
+
+    def wait_for_version(self, version, timeout=None):
+        """Block until a snapshot newer than ``version`` exists; returns it, or None on timeout."""
+        with self._cond:
+            if self._cond.wait_for(lambda: self._snapshot.version > version, timeout):
+                return self._snapshot
+            return None
+
+    def wait_for_phase_change(self, phase, timeout=None):
+        """Block until the phase differs from ``phase``; returns the snapshot, or None on timeout."""
+        with self._cond:
+            if self._cond.wait_for(lambda: self._snapshot.phase != phase, timeout):
+                return self._snapshot
+            return None
+
+    def subscribe(self, callback):
+        """Register ``callback(old, new)`` for every new version; returns a function that unsubscribes."""
+        with self._cond:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._cond:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
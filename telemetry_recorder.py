@@ -0,0 +1,220 @@
+import atexit
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AATLM1\n"
+# Záznam vzorku: tag, čas, id fáze, výška, rychlost, vertikální rychlost, světla (bity), teplota
+SAMPLE = struct.Struct("<cdBfffBf")
+# Záznam nové fáze: tag, id, délka názvu (následuje název v UTF-8)
+PHASE = struct.Struct("<cBB")
+LIGHTS = ("beacon", "strobe", "taxi_light", "landing_light")
+RECORDING_SUFFIX = ".aatl"
+
+
+class TelemetryRecorder:
+    """Appends every telemetry snapshot to a compact binary log.
+
+    Samples are packed into fixed 27-byte records in a bytearray on the
+    writer's thread and flushed to the file once per ``flush_seconds``, so
+    recording costs no disk I/O on the telemetry path. Phase names are
+    written once as definition records and samples refer to them by id.
+    """
+
+    def __init__(self, telemetry_store, path, flush_seconds=1.0):
+        self.telemetry_store = telemetry_store
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.samples = 0
+        self._phase_ids = {}
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsubscribe = None
+        self._stop = threading.Event()
+
+    def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._unsubscribe = self.telemetry_store.subscribe(self._on_snapshot)
+        threading.Thread(target=self._run, name="telemetry-recorder", daemon=True).start()
+        atexit.register(self.close)
+        logger.info(f"Recording telemetry to {self.path}")
+        return self
+
+    def _on_snapshot(self, old, new):
+        with self._lock:
+            phase_id = self._phase_ids.get(new.phase)
+            if phase_id is None:
+                if len(self._phase_ids) >= 255:
+                    return
+                phase_id = self._phase_ids[new.phase] = len(self._phase_ids)
+                name = str(new.phase).encode("utf-8")[:255]
+                self._buffer += PHASE.pack(b"P", phase_id, len(name)) + name
+            lights = sum(1 << bit for bit, key in enumerate(LIGHTS) if new[key])
+            self._buffer += SAMPLE.pack(b"S", new.timestamp, phase_id, new.altitude, new.speed, new.vertical_speed, lights, new.temperature)
+            self.samples += 1
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer or self._file is None:
+                return
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._file.write(data)
+            self._file.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"Failed to write telemetry recording: {e}")
+
+    def close(self):
+        if self._file is None:
+            return
+        self._stop.set()
+        if self._unsubscribe:
+            self._unsubscribe()
+        self.flush()
+        with self._lock:
+            self._file.close()
+            self._file = None
+        logger.info(f"Recorded {self.samples} telemetry samples to {self.path}")
+
+
+def prune_recordings(directory, keep):
+    """Delete all but the ``keep`` newest recordings in ``directory``."""
+    try:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(RECORDING_SUFFIX)]
+        paths.sort(key=os.path.getmtime)
+    except OSError:
+        return
+    for path in paths[:max(0, len(paths) - max(0, keep))]:
+        try:
+            os.remove(path)
+            logger.info(f"Removed old telemetry recording {path}")
+        except OSError as e:
+            logger.warning(f"Failed to remove old telemetry recording {path}: {e}")
+
+
+class Recording:
+    """A recorded flight loaded into column arrays."""
+
+    def __init__(self):
+        self.phases = []
+        self.timestamps = array("d")
+        self.phase_ids = array("B")
+        self.altitude = array("f")
+        self.speed = array("f")
+        self.vertical_speed = array("f")
+        self.lights = array("B")
+        self.temperature = array("f")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def duration(self):
+        return self.timestamps[-1] - self.timestamps[0] if len(self) else 0.0
+
+    def sample(self, index):
+        """The sample at ``index`` as a telemetry update dict."""
+        values = {
+            "phase": self.phases[self.phase_ids[index]],
+            "altitude": round(self.altitude[index], 2),
+            "speed": round(self.speed[index], 2),
+            "vertical_speed": round(self.vertical_speed[index], 2),
+            "temperature": round(self.temperature[index], 2),
+        }
+        for bit, key in enumerate(LIGHTS):
+            values[key] = 1.0 if self.lights[index] & (1 << bit) else 0.0
+        return values
+
+
+def load_recording(path):
+    """Read a recording; an incomplete last record (e.g. after a crash) is ignored."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a telemetry recording")
+    recording = Recording()
+    phases = {}
+    offset = len(MAGIC)
+    while offset < len(data):
+        tag = data[offset:offset + 1]
+        if tag == b"P" and offset + PHASE.size <= len(data):
+            _, phase_id, length = PHASE.unpack_from(data, offset)
+            if offset + PHASE.size + length > len(data):
+                break
+            offset += PHASE.size
+            phases[phase_id] = data[offset:offset + length].decode("utf-8", errors="replace")
+            offset += length
+        elif tag == b"S" and offset + SAMPLE.size <= len(data):
+            _, timestamp, phase_id, altitude, speed, vertical_speed, lights, temperature = SAMPLE.unpack_from(data, offset)
+            offset += SAMPLE.size
+            recording.timestamps.append(timestamp)
+            recording.phase_ids.append(phase_id)
+            recording.altitude.append(altitude)
+            recording.speed.append(speed)
+            recording.vertical_speed.append(vertical_speed)
+            recording.lights.append(lights)
+            recording.temperature.append(temperature)
+        else:
+            if tag not in (b"P", b"S"):
+                logger.warning(f"Unexpected record in {path} at byte {offset}, stopping there")
+            break
+    recording.phases = [phases.get(i, telemetry.DEFAULTS["phase"]) for i in range(max(phases, default=-1) + 1)]
+    return recording
+
+
+class TelemetryReplay:
+    """Feeds a recording into a TelemetryStore at ``speed`` times real time (1x, 10x, 100x...)."""
+
+    def __init__(self, recording, telemetry_store, speed=1.0):
+        if speed <= 0:
+            raise ValueError("replay speed must be positive")
+        self.recording = recording
+        self.telemetry_store = telemetry_store
+        self.speed = speed
+        self.position = 0
+        self._stop = threading.Event()
+        self._done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="telemetry-replay", daemon=True).start()
+        logger.info(f"Replaying {len(self.recording)} samples ({self.recording.duration:.0f}s of flight) at {self.speed:g}x")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        """Block until the whole recording was replayed; False on timeout."""
+        return self._done.wait(timeout)
+
+    def _run(self):
+        try:
+            if not len(self.recording):
+                return
+            first = self.recording.timestamps[0]
+            started = time.monotonic()
+            for index in range(len(self.recording)):
+                due = started + (self.recording.timestamps[index] - first) / self.speed
+                if self._stop.wait(max(0.0, due - time.monotonic())):
+                    return
+                self.telemetry_store.update(self.recording.sample(index))
+                self.position = index + 1
+            logger.info("Telemetry replay finished")
+        finally:
+            self._done.set()
@@ -0,0 +1,59 @@
+import pytest
+
+import flight_data_watcher
+
+KNOWN_KEYS = flight_data_watcher.REQUIRED_KEYS + ("local_time",)
+
+COMPLETE = (
+    "phase=Taxi (Lights On)\n"
+    "altitude=512.5\n"
+    "speed=12\n"
+    "vertical_speed=0\n"
+    "beacon=1\n"
+    "strobe=0\n"
+    "taxi_light=1\n"
+    "landing_light=0\n"
+    "temperature=18.5\n"
+    "local_time=14:32:10\n"
+)
+
+
+def test_complete_file_is_parsed_into_typed_values():
+    data = flight_data_watcher.parse_flight_data(COMPLETE, KNOWN_KEYS)
+    assert data["phase"] == "Taxi (Lights On)"
+    assert data["altitude"] == 512.5
+    assert data["beacon"] == 1.0
+    assert data["local_time"] == "14:32"
+
+
+def test_unknown_keys_and_junk_lines_are_ignored():
+    data = flight_data_watcher.parse_flight_data("# header\nflaps=3\n" + COMPLETE, KNOWN_KEYS)
+    assert "flaps" not in data
+
+
+@pytest.mark.parametrize("content", [
+    COMPLETE[:-1],                                  # chybí koncový řádek
+    COMPLETE[:COMPLETE.index("temperature")],       # zápis uříznutý uprostřed
+    COMPLETE.replace("speed=12", "speed=1.2.3"),    # rozbitá hodnota
+    COMPLETE.replace("altitude=512.5", "altitude="),
+    "",
+])
+def test_partial_or_damaged_content_is_a_torn_write(content):
+    with pytest.raises(flight_data_watcher.TornWrite):
+        flight_data_watcher.parse_flight_data(content, KNOWN_KEYS)
+
+
+def test_reading_a_torn_file_gives_up_without_raising(tmp_path):
+    path = tmp_path / "flight_data.txt"
+    path.write_text(COMPLETE[:40], encoding="utf-8")
+    assert flight_data_watcher.read_flight_data_file(str(path), KNOWN_KEYS, retries=2, retry_delay=0) is None
+
+
+def test_reading_a_missing_file_returns_none(tmp_path):
+    assert flight_data_watcher.read_flight_data_file(str(tmp_path / "missing.txt"), KNOWN_KEYS) is None
+
+
+def test_reading_a_complete_file(tmp_path):
+    path = tmp_path / "flight_data.txt"
+    path.write_text(COMPLETE, encoding="utf-8")
+    assert flight_data_watcher.read_flight_data_file(str(path), KNOWN_KEYS)["speed"] == 12.0
@@ -0,0 +1,134 @@
+import time
+import types
+
+import pytest
+
+import phase_machine
+import telemetry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(phase_machine, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep, time=time.time))
+    return clock
+
+
+@pytest.fixture
+def played():
+    return []
+
+
+@pytest.fixture
+def machine(played):
+    store = telemetry.TelemetryStore()
+    return phase_machine.PhaseStateMachine(store, lambda name, snapshot: played.append(name))
+
+
+def hold(machine, clock, phase, seconds):
+    """Report ``phase`` and let ``seconds`` pass, as the detector thread would."""
+    machine._observe(telemetry.TelemetrySnapshot(phase=phase))
+    clock.now += seconds
+    machine._check_candidate()
+
+
+def dispatch(machine):
+    """Play everything queued so far on the calling thread."""
+    machine._queue.put(None)
+    machine._run_dispatcher()
+
+
+def test_phase_is_confirmed_only_after_the_debounce(machine, clock):
+    hold(machine, clock, "Gate", 1.0)
+    hold(machine, clock, "Pushback", 0.5)
+    assert machine.phase == "Gate"
+    hold(machine, clock, "Pushback", 0.5)
+    assert machine.phase == "Pushback"
+
+
+def test_flicker_back_restarts_the_debounce(machine, clock):
+    hold(machine, clock, "Climb", 3.0)
+    hold(machine, clock, "Cruise", 6.0)
+    hold(machine, clock, "Climb", 0.1)
+    hold(machine, clock, "Cruise", 6.0)
+    assert machine.phase == "Climb"
+    hold(machine, clock, "Cruise", 4.0)
+    assert machine.phase == "Cruise"
+
+
+def test_aliases_are_the_same_phase(machine, clock):
+    hold(machine, clock, "Taxi", 1.0)
+    hold(machine, clock, "Taxi (Lights On)", 5.0)
+    assert machine.phase == "Taxi"
+    assert [phase for _, phase in machine.history] == ["Taxi"]
+
+
+def test_unexpected_transition_needs_to_persist_for_resync(machine, clock):
+    hold(machine, clock, "Gate", 1.0)
+    hold(machine, clock, "Cruise", phase_machine.RESYNC_SECONDS - 1)
+    assert machine.phase == "Gate"
+    hold(machine, clock, "Cruise", 1.0)
+    assert machine.phase == "Cruise"
+
+
+def test_unknown_phase_names_are_ignored(machine, clock):
+    hold(machine, clock, "Gate", 1.0)
+    hold(machine, clock, "Hovering", 60.0)
+    assert machine.phase == "Gate"
+
+
+def test_skipped_phases_queue_their_announcements_in_order(machine, clock, played):
+    machine.played.update({"AirportBoarding", "Gate"})
+    hold(machine, clock, "Gate", 1.0)
+    hold(machine, clock, "Pushback", 1.0)
+    hold(machine, clock, "Takeoff", 1.0)
+    assert [job.name for job in machine.owed()] == ["Pushback", "Safety", "Takeoff"]
+
+    dispatch(machine)
+
+    # Pushback i bezpečnostní ukázka jsou o dvě fáze pozadu, hraje se jen Takeoff
+    assert played == ["Takeoff"]
+    assert {job.name: job.status for job in machine.jobs} == {"Pushback": "skipped", "Safety": "skipped", "Takeoff": "done"}
+    assert clock.slept == []
+
+
+def test_announcements_one_phase_behind_are_still_played(machine, clock, played):
+    machine.played.update({"AirportBoarding", "Gate"})
+    hold(machine, clock, "Gate", 1.0)
+    hold(machine, clock, "Pushback", 1.0)
+    hold(machine, clock, "Taxi", 1.0)
+
+    dispatch(machine)
+
+    assert played == ["Pushback", "Safety"]
+    assert clock.slept == [5]
+
+
+def test_played_and_disabled_announcements_are_not_owed(played, clock):
+    machine = phase_machine.PhaseStateMachine(telemetry.TelemetryStore(), lambda name, snapshot: played.append(name),
+                                              played={"Pushback"}, disabled={"Safety"})
+    hold(machine, clock, "Pushback", 1.0)
+    assert machine.owed() == []
+
+
+def test_failed_announcement_does_not_stop_the_dispatcher(clock):
+    def play(name, snapshot):
+        if name == "AirportBoarding":
+            raise RuntimeError("no audio device")
+
+    machine = phase_machine.PhaseStateMachine(telemetry.TelemetryStore(), play)
+    hold(machine, clock, "Gate", 1.0)
+    dispatch(machine)
+    assert [(job.name, job.status) for job in machine.jobs] == [("AirportBoarding", "failed"), ("Gate", "done")]
@@ -0,0 +1,41 @@
+import scratch
+
+
+def test_released_memory_buffer_can_be_formatted(tmp_path):
+    arena = scratch.ScratchArena(spill_dir=str(tmp_path), tmpfs_dir=None)
+    buffer = arena.put(b"audio", ".mp3", name="combined")
+    assert buffer.in_memory
+    buffer.release()
+    assert buffer.size == 0
+    assert "released" in repr(buffer)
+    assert f"{buffer}"
+
+
+def test_released_spilled_buffer_can_be_formatted(tmp_path):
+    arena = scratch.ScratchArena(spill_dir=str(tmp_path), memory_budget=0, tmpfs_dir=None)
+    buffer = arena.put(b"audio", ".mp3", name="combined")
+    assert not buffer.in_memory
+    buffer.release()
+    assert buffer.size == 0
+    assert repr(buffer)
+
+
+def test_tmpfs_files_count_against_the_memory_budget(tmp_path):
+    tmpfs = tmp_path / "tmpfs"
+    tmpfs.mkdir()
+    arena = scratch.ScratchArena(spill_dir=str(tmp_path / "spill"), memory_budget=100, tmpfs_dir=str(tmpfs))
+    first = arena.file(".wav", name="render")
+    assert first.path.startswith(str(tmpfs))
+    with open(first.path, "wb") as f:
+        f.write(b"\0" * 100)
+    second = arena.file(".wav", name="render")
+    assert not second.path.startswith(str(tmpfs))
+    assert arena.stats()["spills"] == 1
+    assert not arena.put(b"audio").in_memory
+
+
+def test_no_spill_is_counted_without_tmpfs(tmp_path):
+    arena = scratch.ScratchArena(spill_dir=str(tmp_path), tmpfs_dir=None)
+    arena.file(".wav")
+    arena.file(".wav")
+    assert arena.stats()["spills"] == 0
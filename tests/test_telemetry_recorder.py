@@ -0,0 +1,78 @@
+import pytest
+
+import telemetry
+import telemetry_recorder
+
+FLIGHT = [
+    {"phase": "Gate", "beacon": 1.0, "temperature": 18.5},
+    {"phase": "Pushback", "speed": 2.0, "strobe": 0.0},
+    {"phase": "Taxi (Lights On)", "speed": 15.0, "taxi_light": 1.0},
+    {"phase": "Takeoff", "speed": 140.0, "strobe": 1.0, "landing_light": 1.0},
+    {"phase": "Climb", "altitude": 3500.25, "vertical_speed": 2200.0},
+]
+
+
+def record(path, updates):
+    store = telemetry.TelemetryStore()
+    recorder = telemetry_recorder.TelemetryRecorder(store, str(path), flush_seconds=60).start()
+    for changes in updates:
+        store.update(changes)
+    recorder.close()
+    return recorder
+
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path / f"flight{telemetry_recorder.RECORDING_SUFFIX}"
+    recorder = record(path, FLIGHT)
+    recording = telemetry_recorder.load_recording(str(path))
+
+    assert len(recording) == recorder.samples == len(FLIGHT)
+    expected = dict(telemetry.DEFAULTS)
+    for index, changes in enumerate(FLIGHT):
+        expected.update(changes)
+        sample = recording.sample(index)
+        assert sample == {key: expected[key] for key in sample}
+    assert recording.duration >= 0
+
+
+def test_truncated_last_record_is_ignored(tmp_path):
+    path = tmp_path / "flight.aatl"
+    record(path, FLIGHT)
+    data = path.read_bytes()
+    for cut in range(1, telemetry_recorder.SAMPLE.size):
+        path.write_bytes(data[:-cut])
+        recording = telemetry_recorder.load_recording(str(path))
+        assert len(recording) == len(FLIGHT) - 1
+        assert recording.sample(len(recording) - 1)["phase"] == "Takeoff"
+
+
+def test_truncated_phase_name_is_ignored(tmp_path):
+    path = tmp_path / "flight.aatl"
+    record(path, FLIGHT[:1])
+    name = b"Pushback"
+    data = path.read_bytes() + telemetry_recorder.PHASE.pack(b"P", 1, len(name)) + name[:3]
+    path.write_bytes(data)
+    recording = telemetry_recorder.load_recording(str(path))
+    assert recording.phases == ["Gate"]
+
+
+def test_appending_to_an_existing_recording(tmp_path):
+    path = tmp_path / "flight.aatl"
+    record(path, FLIGHT[:2])
+    record(path, FLIGHT[2:])
+    assert len(telemetry_recorder.load_recording(str(path))) == len(FLIGHT)
+
+
+@pytest.mark.parametrize("content", [b"", b"AATL", b"not a recording at all\n"])
+def test_foreign_file_raises_value_error(tmp_path, content):
+    path = tmp_path / "flight.aatl"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        telemetry_recorder.load_recording(str(path))
+
+
+def test_garbage_after_valid_records_is_skipped(tmp_path):
+    path = tmp_path / "flight.aatl"
+    record(path, FLIGHT)
+    path.write_bytes(path.read_bytes() + b"\x00garbage")
+    assert len(telemetry_recorder.load_recording(str(path))) == len(FLIGHT)
@@ -0,0 +1,26 @@
+import pytest
+
+import udp_telemetry
+
+
+def test_datagram_is_parsed_into_sequence_and_sample():
+    seq, sample = udp_telemetry.parse_datagram(b"AA1;42;Climb;12000.5;250;1800;1;0;0;1;-4.5\n")
+    assert seq == 42
+    assert sample == {
+        "phase": "Climb", "altitude": 12000.5, "speed": 250.0, "vertical_speed": 1800.0,
+        "beacon": 1.0, "strobe": 0.0, "taxi_light": 0.0, "landing_light": 1.0, "temperature": -4.5,
+    }
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"AA1;42;Climb;12000.5;250",                         # uříznutý datagram
+    b"AA1;42;Climb;12000.5;250;1800;1;0;0;1;-4.5;7",     # pole navíc
+    b"XX9;42;Climb;12000.5;250;1800;1;0;0;1;-4.5",       # cizí protokol
+    b"AA1;x;Climb;12000.5;250;1800;1;0;0;1;-4.5",        # rozbité sekvenční číslo
+    b"AA1;42;Climb;12000.5;fast;1800;1;0;0;1;-4.5",      # rozbitá hodnota
+    b"AA1;42;Cl\xffmb;12000.5;250;1800;1;0;0;1;-4.5",    # neplatné UTF-8
+])
+def test_foreign_or_damaged_datagrams_raise_value_error(data):
+    with pytest.raises(ValueError):
+        udp_telemetry.parse_datagram(data)
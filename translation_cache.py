@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationCache:
+    """SQLite translation memory keyed by source text hash, language, style and model.
+
+    Entries older than ``ttl_seconds`` are treated as missing. When the store
+    grows over ``max_entries`` the least recently used rows are dropped.
+    """
+
+    def __init__(self, db_path, ttl_seconds=30 * 24 * 3600, max_entries=5000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " text_hash TEXT NOT NULL,"
+                " lang TEXT NOT NULL,"
+                " style TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " translation TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (text_hash, lang, style, model))"
+            )
+        self.purge_expired()
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text, lang, style, model):
+        """Return the stored translation or None."""
+        key = (self.text_hash(text), lang, style, model)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation, created FROM translations"
+                " WHERE text_hash = ? AND lang = ? AND style = ? AND model = ?",
+                key
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE translations SET last_used = ?"
+                    " WHERE text_hash = ? AND lang = ? AND style = ? AND model = ?",
+                    (now,) + key
+                )
+            self.hits += 1
+            return row[0]
+
+    def put(self, text, lang, style, model, translation):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations"
+                    " (text_hash, lang, style, model, translation, created, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.text_hash(text), lang, style, model, translation, now, now)
+                )
+                self._conn.execute(
+                    "DELETE FROM translations WHERE rowid IN ("
+                    " SELECT rowid FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def purge_expired(self):
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute(
+                    "DELETE FROM translations WHERE created < ?",
+                    (time.time() - self.ttl_seconds,)
+                ).rowcount
+        if deleted:
+            logger.info(f"Removed {deleted} expired translations from {self.db_path}")
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "entries": count,
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,105 @@
+import logging
+import select
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 49555
+PROTOCOL = "AA1"
+# Po takové pauze bereme jakékoli sekvenční číslo (reload skriptu, restart X-Plane)
+SESSION_TIMEOUT_SECONDS = 2.0
+
+# Pořadí polí v datagramu z flight_data_sender.lua (za hlavičkou a sekvenčním číslem)
+FIELDS = ("phase", "altitude", "speed", "vertical_speed", "beacon", "strobe", "taxi_light", "landing_light", "temperature")
+
+
+def parse_datagram(data):
+    """Parse ``AA1;seq;phase;altitude;...`` into (seq, sample); raises ValueError for foreign or damaged packets."""
+    parts = data.decode("utf-8").strip().split(";")
+    if len(parts) != len(FIELDS) + 2 or parts[0] != PROTOCOL:
+        raise ValueError(f"unexpected datagram: {data[:40]!r}")
+    sample = {"phase": parts[2]}
+    for key, value in zip(FIELDS[1:], parts[3:]):
+        sample[key] = float(value)
+    return int(parts[1]), sample
+
+
+class UdpTelemetryListener:
+    """Receives telemetry datagrams from FlyWithLua on a local port.
+
+    The socket is non-blocking: every wake-up drains all queued datagrams and
+    only the newest sample (by sequence number) is handed to ``on_sample``, so
+    a burst never builds up a backlog. After ``session_timeout`` without an
+    accepted packet any sequence number is taken, so a restarted sender
+    (Lua reload, X-Plane restart) is followed again within seconds.
+    """
+
+    def __init__(self, on_sample, host=DEFAULT_HOST, port=DEFAULT_PORT, session_timeout=SESSION_TIMEOUT_SECONDS):
+        self.on_sample = on_sample
+        self.host = host
+        self.port = port
+        self.session_timeout = session_timeout
+        self.last_seq = None
+        self.last_accepted = None
+        self.received = 0
+        self.dropped = 0
+        self._sock = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self._sock.setblocking(False)
+        threading.Thread(target=self._run, name="udp-telemetry", daemon=True).start()
+        logger.info(f"Listening for UDP telemetry on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _is_newer(self, seq):
+        if self.last_seq is None or seq > self.last_seq:
+            return True
+        return time.monotonic() - self.last_accepted >= self.session_timeout
+
+    def _drain(self):
+        latest = None
+        while True:
+            try:
+                data, _ = self._sock.recvfrom(2048)
+            except BlockingIOError:
+                return latest
+            except OSError as e:
+                # Windows hlásí ICMP "port unreachable" z předchozího sendto jako chybu recvfrom
+                logger.debug(f"UDP telemetry receive error: {e}")
+                continue
+            try:
+                seq, sample = parse_datagram(data)
+            except (ValueError, UnicodeDecodeError) as e:
+                self.dropped += 1
+                logger.debug(f"Ignoring datagram: {e}")
+                continue
+            self.received += 1
+            if not self._is_newer(seq):
+                self.dropped += 1
+                continue
+            self.last_seq = seq
+            self.last_accepted = time.monotonic()
+            latest = sample
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if not select.select([self._sock], [], [], 1.0)[0]:
+                    continue
+                sample = self._drain()
+                if sample is not None:
+                    try:
+                        self.on_sample(sample)
+                    except Exception as e:
+                        logger.error(f"Failed to apply UDP telemetry sample: {e}")
+        finally:
+            self._sock.close()